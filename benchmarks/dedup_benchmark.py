@@ -0,0 +1,69 @@
+# Compare the row-by-row and the set-based modes of the deduplicate module
+# on a synthetic recon-ng workspace database.
+#
+#   python benchmarks/dedup_benchmark.py [rows] [distinct]
+#
+# Every statement opens its own connection and commits, like recon-ng's
+# BaseModule.query() does.
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from ripelib.dedup import delete_duplicates_query
+
+
+def build(path, rows, distinct):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE hosts (host TEXT, ip_address TEXT, region TEXT, country TEXT, latitude TEXT, longitude TEXT, notes TEXT, module TEXT)')
+    random.seed(1)
+    conn.executemany('INSERT INTO hosts (host, ip_address, module) VALUES (?,?,?)',
+                     ((f'host{n}.example.com', f'10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}', 'bench')
+                      for n in (random.randrange(distinct) for _ in range(rows))))
+    conn.commit()
+    conn.close()
+
+
+def query(path, sql):
+    conn = sqlite3.connect(path)
+    rows = conn.execute(sql).fetchall()
+    conn.commit()
+    conn.close()
+    return rows
+
+
+def row_mode(path, table, column):
+    key = table[:-1]
+    for item in query(path, f'SELECT DISTINCT {key},{column} FROM "{table}" ORDER BY "{key}"'):
+        rows = query(path, f'SELECT rowid,{key},{column} FROM "{table}" WHERE {key}=="{item[0]}" AND {column}=="{item[1]}" ORDER BY rowid')
+        for row in rows[1:]:
+            query(path, f'DELETE FROM {table} WHERE rowid == "{row[0]}"')
+
+
+def set_mode(path, table, column):
+    query(path, delete_duplicates_query(table, table[:-1], column))
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    distinct = int(sys.argv[2]) if len(sys.argv) > 2 else rows // 2
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, function in (('row', row_mode), ('set', set_mode)):
+            path = os.path.join(workdir, f'{name}.db')
+            build(path, rows, distinct)
+            started = time.perf_counter()
+            function(path, 'hosts', 'ip_address')
+            elapsed = time.perf_counter() - started
+            left = query(path, 'SELECT COUNT(rowid) FROM hosts')[0][0]
+            results[name] = left
+            print(f'{name:>4} mode: {rows} rows -> {left} rows in {elapsed:.2f}s')
+    if results['row'] != results['set']:
+        print('modes disagree!')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# Parse throughput of the RPSL dump parser, serial and with multiprocessing,
+# on a synthetic dump that looks like ripe.db.inetnum.
+#
+#   python benchmarks/rpsl_benchmark.py [objects] [processes]
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from ripelib.mirror import pipelined_blocks, pipelined_lines
+from ripelib.rpsl import iter_rpsl, parse_parallel
+
+OBJECT = '''inetnum:        10.{a}.{b}.0 - 10.{a}.{b}.255
+netname:        NET-{n}
+descr:          Synthetic network {n}
+                continued description # with a comment
+country:        NL
+admin-c:        AA{n}-RIPE
+tech-c:         TT{n}-RIPE
+status:         ASSIGNED PA
+mnt-by:         MNT-{m}
+created:        2020-01-01T00:00:00Z
+last-modified:  2021-01-01T00:00:00Z
+source:         RIPE
+
+'''
+
+
+def build(path, objects):
+    with open(path, 'w') as outfile:
+        outfile.write('# synthetic RIPE dump\n\n')
+        for n in range(objects):
+            outfile.write(OBJECT.format(a=n >> 8 & 255, b=n & 255, n=n, m=n % 97))
+
+
+def measure(name, objects):
+    started = time.perf_counter()
+    count = sum(1 for _ in objects)
+    elapsed = time.perf_counter() - started
+    print(f'{name:>12}: {count} objects in {elapsed:.1f}s, {count / elapsed:,.0f} objects/s')
+    return count
+
+
+def main():
+    objects = int(sys.argv[1]) if len(sys.argv) > 1 else 2000000
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else multiprocessing.cpu_count()
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'ripe.db.inetnum')
+        build(path, objects)
+        print(f'{objects} objects, {os.path.getsize(path) / 1e6:.0f} MB, {processes} processes')
+        serial = measure('serial', iter_rpsl(pipelined_lines(path)))
+        parallel = measure('parallel', parse_parallel(pipelined_blocks(path), processes))
+    if serial != parallel:
+        print('object counts differ!')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+# Build time, memory and lookup rate of the longest-prefix-match trie used by
+# the ripe_host_netblocks module, on random IPv4 and IPv6 prefixes.
+#
+#   python benchmarks/trie_benchmark.py [prefixes] [lookups]
+import ipaddress
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from ripelib.trie import NetblockTrie
+
+
+def main():
+    prefixes = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+    random.seed(1)
+    netblocks = [str(ipaddress.IPv4Network((random.getrandbits(32), random.randint(8, 30)), strict=False))
+                 for _ in range(prefixes * 3 // 4)]
+    netblocks += [str(ipaddress.IPv6Network((0x2000 << 112 | random.getrandbits(112), random.randint(19, 64)), strict=False))
+                  for _ in range(prefixes - len(netblocks))]
+    addresses = ['%d.%d.%d.%d' % tuple(random.getrandbits(8) for _ in range(4)) for _ in range(lookups)]
+
+    start = time.perf_counter()
+    trie = NetblockTrie()
+    for netblock in netblocks:
+        trie.add(netblock)
+    elapsed = time.perf_counter() - start
+    nodes = sum(len(t._length) for t in trie.tries.values())
+    size = sum(a.itemsize * len(a) for t in trie.tries.values()
+               for a in (t._length, t._zero, t._one, t._value, t._low, t._high) if a is not None)
+    print(f'build:  {len(trie)} prefixes, {nodes} nodes in {elapsed:.1f}s, {size / 1e6:.0f} MB of node arrays ({size / len(trie):.0f} bytes per prefix)')
+
+    lookup = trie.lookup
+    start = time.perf_counter()
+    found = sum(1 for address in addresses if lookup(address) is not None)
+    elapsed = time.perf_counter() - start
+    print(f'lookup: {lookups} IPv4 addresses in {elapsed:.1f}s, {lookups / elapsed:,.0f}/s, {found} matched')
+
+
+if __name__ == '__main__':
+    main()
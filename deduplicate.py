@@ -1,6 +1,11 @@
 from recon.core.module import BaseModule
 import codecs
 import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ripelib.dedup import compile_patterns, count_duplicates_query, delete_duplicates_query
 
 class Module(BaseModule):
 
@@ -14,17 +19,21 @@ class Module(BaseModule):
             ('column', 'ip_address', True, 'source column to compare items'),
             ('nulls', True, False, 'remove rows from the dataset with empty column'),
             ('filename', False, False, 'path and filename for remove strings'),
+            ('mode', 'set', False, 'set: one statement per step, row: one query per item or pattern'),
+            ('dry_run', False, False, 'only count the rows every step would remove, nothing is deleted'),
         ),
     }
 
-    def deduplicate(self,table,column,item):
+    def deduplicate(self,table,column,item,dry_run=False):
         #self.output("Start to remove duplicated rows")
         query = f'SELECT rowid,{table[:-1]},{column} FROM "{table}" WHERE {table[:-1]}=="{item[0]}" AND {column}=="{item[1]}" ORDER BY rowid'
         #self.output(query)
         rows = self.query(query)
         count = 0
 
-        if len(rows) > 1:
+        if len(rows) > 1 and dry_run:
+            self.output(f"{len(rows) - 1} duplicates of {rows[0][1]} would be removed from '{table}'.")
+        elif len(rows) > 1:
             print(f'Found {len(rows)} duplicates of {rows[0][1]}')
             first_rowid = rows[0][0]
             for row in rows:
@@ -38,12 +47,27 @@ class Module(BaseModule):
             self.output(f"{count} items removed from '{table}'.")
         #self.output("End of remove duplicated rows")
 
-    def remove_special(self,table,column,filename):
+    def deduplicate_set(self,table,column,dry_run=False):
+        if dry_run:
+            count = self.query(count_duplicates_query(table, table[:-1], column))[0][0]
+            self.output(f"{count} duplicate items would be removed from '{table}'.")
+            return
+        query = f'SELECT COUNT(rowid) FROM "{table}"'
+        before = self.query(query)[0][0]
+        self.query(delete_duplicates_query(table, table[:-1], column))
+        after = self.query(query)[0][0]
+        self.output(f"{before - after} items removed from '{table}', {after} distinct items left.")
+
+    def remove_special(self,table,column,filename,dry_run=False):
         self.output("Start to remove rows which contains defined strings")
         with codecs.open(filename, 'r', encoding='utf-8') as infile:
             for line in infile:
                 line = line.rstrip()
                 print(line)
+                if dry_run:
+                    count = self.query(f'SELECT COUNT(rowid) FROM "{table}" WHERE {table[:-1]} LIKE "%{line}%"')[0][0]
+                    self.output(f"{count} rows of '{table}' contain {line}.")
+                    continue
                 query = f'SELECT rowid,{table[:-1]},{column} FROM "{table}" WHERE {table[:-1]} LIKE "%{line}%"'
                 #print(query)
                 rows = self.query(query)
@@ -53,16 +77,42 @@ class Module(BaseModule):
                 self.query(query)
         self.output("End of remove rows which contains defined strings")
 
-    def remove_empty(self,table,column):
+    def remove_special_set(self,table,column,filename,dry_run=False):
+        self.output("Start to remove rows which contains defined strings")
+        with codecs.open(filename, 'r', encoding='utf-8') as infile:
+            matcher = compile_patterns(infile)
+        if matcher is None:
+            self.output("No strings defined in " + filename)
+            return
+        # one scan of the table for all patterns, deleted in a single transaction
+        conn = sqlite3.connect(os.path.join(self.workspace, 'data.db'))
+        conn.create_function('matches_special', 1, lambda value: value is not None and matcher.search(str(value)) is not None, deterministic=True)
+        try:
+            with conn:
+                if dry_run:
+                    count = conn.execute(f'SELECT COUNT(rowid) FROM "{table}" WHERE matches_special({table[:-1]})').fetchone()[0]
+                    self.output(f"{count} rows of '{table}' contain defined strings.")
+                else:
+                    count = conn.execute(f'DELETE FROM "{table}" WHERE matches_special({table[:-1]})').rowcount
+                    self.output(f"{count} items removed from '{table}'.")
+        finally:
+            conn.close()
+        self.output("End of remove rows which contains defined strings")
+
+    def remove_empty(self,table,column,dry_run=False):
         self.output("Start to remove empty rows")
-        query = f'SELECT rowid,{table[:-1]},{column} FROM "{table}" WHERE {column} IS NULL ORDER BY rowid'
-        rows = self.query(query)
-        for row in rows:
-            print(f'TO DELETE {row}')
-        query = f'DELETE FROM {table} WHERE {column} IS NULL'
-        # print(query)
-        result = self.query(query)
-        print(result)
+        if dry_run:
+            count = self.query(f'SELECT COUNT(rowid) FROM "{table}" WHERE {column} IS NULL')[0][0]
+            self.output(f"{count} rows of '{table}' have an empty {column}.")
+        else:
+            query = f'SELECT rowid,{table[:-1]},{column} FROM "{table}" WHERE {column} IS NULL ORDER BY rowid'
+            rows = self.query(query)
+            for row in rows:
+                print(f'TO DELETE {row}')
+            query = f'DELETE FROM {table} WHERE {column} IS NULL'
+            # print(query)
+            result = self.query(query)
+            print(result)
         self.output("End of remove empty rows")
 
     def module_run(self):
@@ -75,22 +125,32 @@ class Module(BaseModule):
         self.output(f'There are {count[0][0]} rows in table {table}')
         self.output("Start deduplication")
 
+        dry_run = self.options['dry_run']
+        if dry_run:
+            self.output("Dry run, no rows are removed")
+
         # Optional: remove rows with empty data in column
         if self.options['nulls']:
-            self.remove_empty(table,column)
+            self.remove_empty(table,column,dry_run)
 
         # Optional: remove rows with defined strings in name
         if self.options['filename']:
-            self.remove_special(table,column,self.options['filename'])
+            if self.options['mode'] == 'row':
+                self.remove_special(table,column,self.options['filename'],dry_run)
+            else:
+                self.remove_special_set(table,column,self.options['filename'],dry_run)
 
-        # Query to select distinct items
-        query = f'SELECT DISTINCT {table[:-1]},{column} FROM "{table}" ORDER BY "{table[:-1]}"'
-        #self.output(query)
-        rows = self.query(query)
-        for row in rows:
-            #print(row)
-            self.deduplicate(table,column,row)
-            #print(f'{table[:-1]}:{row[0]}, {column}:{row[1]}')
+        if self.options['mode'] == 'row':
+            # Query to select distinct items
+            query = f'SELECT DISTINCT {table[:-1]},{column} FROM "{table}" ORDER BY "{table[:-1]}"'
+            #self.output(query)
+            rows = self.query(query)
+            for row in rows:
+                #print(row)
+                self.deduplicate(table,column,row,dry_run)
+                #print(f'{table[:-1]}:{row[0]}, {column}:{row[1]}')
+        else:
+            self.deduplicate_set(table,column,dry_run)
         #self.output(f"{len(rows)} distinct items found in '{table}'.")
         self.output("End deduplication")
         query = f'SELECT COUNT(rowid) FROM {table}'
@@ -5,14 +5,23 @@ from recon.core.module import BaseModule
 from recon.mixins.resolver import ResolverMixin
 from recon.mixins.threads import ThreadingMixin
 # module specific imports
-from urlparse import urlparse
+from urllib.parse import urlparse
 import os
 import json
 import re
 import ipaddress
 import math
+import sys
 
-class Module(BaseModule, ResolverMixin, ThreadingMixin):
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ripelib.client import CachedRequestMixin, REST_SEARCH_URL, RequestFailed
+from ripelib.intervals import get_index, save_index
+from ripelib.net import RANGE_TYPES, inetnum_to_cidrs, range_type
+from ripelib.netblocks import ensure_netblock_columns, netblock_row
+from ripelib.rpsl import parse_rest_response
+from ripelib.source import StreamingSourceMixin
+
+class Module(StreamingSourceMixin, BaseModule, ResolverMixin, ThreadingMixin, CachedRequestMixin):
 
     # modules are defined and configured by the "meta" class variable
     # "meta" is a dictionary that contains information about the module, ranging from basic information, to input that affects how the module functions
@@ -31,6 +40,18 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
         'query': 'SELECT DISTINCT ip_address FROM hosts WHERE ip_address IS NOT NULL',
         'options': (
             ('nameserver', '8.8.8.8', 'yes', 'ip address of a valid nameserver'),
+            ('cache', True, False, 'cache responses in ripe_cache.db in the workspace'),
+            ('cache_size', 64, False, 'maximum size of the response cache in MB'),
+            ('rate', 10, False, 'maximum number of requests per second per host (0 = unlimited)'),
+            ('burst', 10, False, 'number of requests allowed at once before the rate applies'),
+            ('retries', 3, False, 'number of times a throttled or timed out item is requeued'),
+            ('incremental', False, False, 'only process inputs not resolved by an earlier run (progress in ripe_progress.db)'),
+            ('max_age', 30, False, 'days after which an input resolved earlier is processed again in incremental runs (0 = never)'),
+            ('backend', 'remote', False, 'remote: query the RIPE REST API, local: use the mirror loaded by ripe_mirror'),
+            ('mirror', '', False, 'path of the local mirror database (default: ripe_mirror.db in the workspace)'),
+            ('engine', 'threads', False, 'request engine: threads or async (keep-alive connection pool)'),
+            ('concurrency', 32, False, 'maximum number of in-flight requests of the async engine'),
+            ('connections', 4, False, 'maximum number of persistent connections per host of the async engine'),
         ),
     }
     #search_result = ""
@@ -48,7 +69,7 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
         # override this method to execute code prior to calling the "module_run" method
         # returned values are passed to the "module_run" method and must be captured in a parameter
 
-	# extend the "netblocks"-table
+        # extend the "netblocks"-table
         try:
             self.query("ALTER TABLE netblocks ADD COLUMN admin TEXT")
         except Exception as e:
@@ -69,6 +90,7 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
         except Exception as e:
             print("[*] Column most likely exists.  Error returned: " + str(e))
 
+        ensure_netblock_columns(self.query)
         return 1
 
     # mandatory method
@@ -83,7 +105,9 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
         # "self.thread" takes at least one argument
         # the first argument must be an iterable that contains all of the items to fill the queue
         # all other arguments get blindly passed to the "module_thread" method where they can be accessed at the thread level
-        self.thread(ips)
+        self.inetnums = get_index(self.workspace)
+        self.dispatch(ips)
+        save_index(self.workspace)
 
     # optional method
     # the first received parameter is required to capture an item from the queue
@@ -92,74 +116,43 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
         # never catch KeyboardInterrupt exceptions in the "module_thread" method as threads don't see them
         # do something leveraging the api methods discussed below
 #        self.output('Search netblock for '+ip)
-        resp = self.request('https://rest.db.ripe.net/search.json?query-string='+ip+'&type-filter=inet6num&type-filter=inetnum&flags=no-irt&flags=no-filtering&flags=no-referenced', method='GET', headers={'Accept': 'application/json'})
-
-    	if resp.status_code != 200:
-    	    self.output('Got error response:'+str(resp.status_code))
-            exit;
-
-	#print resp.json
-	#self.output("JSON data:"+str(resp.json()["objects"]))
-#    for name, series in resp.json()["objects"].iteritems():
-#        print series["type"]
-
-        data = json.loads(resp.text,"UTF-8")
-        #self.parse_object(data)
-#        self.search_key(data,"objects")
-        resp_type = data["objects"]["object"][0]["type"]
-#        self.output("\nResponse type: "+resp_type)
-        if resp_type != "inetnum":
-            self.output("something got wrong, there is no inetnum in response...")
-            exit;
-
-        description = ""
-
-        for attribute in data["objects"]["object"][0]["attributes"]["attribute"]:
-            name = attribute["name"]
-            if name == "inetnum":
-                    inetnum = attribute["value"]
-            elif name == "netname":
-                    netname = attribute["value"]
-            elif name == "descr":
-                    description += attribute["value"]
-		    description += ", "
-            elif name == "country":
-                    country = attribute["value"]
-            elif name == "admin-c":
-                    admin = attribute["value"]
+        ripe_object = self.inetnums.lookup(ip)
+        if ripe_object is not None:
+            # its netblocks were written when the range was resolved
+            self.verbose("%s is covered by already resolved %s" % (ip, ripe_object.key))
+            return
+        if self.options['backend'] == 'local':
+            objects = self.mirror_search(ip, range_type(ip))
+            if not objects:
+                return
+            ripe_object = objects[0]
+            self.inetnums.add_object(ripe_object)
+        else:
+            resp = self.cached_request(REST_SEARCH_URL, [('query-string', ip), ('type-filter', 'inet6num'), ('type-filter', 'inetnum'), ('flags', 'no-irt'), ('flags', 'no-filtering'), ('flags', 'no-referenced')], range_type(ip))
+
+            if not self.check_response(resp, ip):
+                return
+
+            try:
+                ripe_object = parse_rest_response(resp.text)[0]
+            except ValueError:
+                raise RequestFailed("Could not find a valid JSON in response!")
+            except IndexError:
+                return
+#            self.output("\nResponse type: "+ripe_object.type)
+            if ripe_object.type not in RANGE_TYPES:
+                self.output("something got wrong, there is no inetnum or inet6num in response...")
+                return
+            self.inetnums.add_object(ripe_object)
+
+        inetnum = ripe_object.key
+        netname = ripe_object.value("netname")
+        country = ripe_object.value("country")
+        admin = ripe_object.value("admin-c")
+        description = "".join(descr + ", " for descr in ripe_object.getall("descr"))
 
         self.output("I did found net with netname "+netname+" with IP range "+inetnum+" maintained by "+admin+" and located in "+country+" and following description: "+description)
-        net = self.parse_inetnum_to_cidr(str(inetnum))
-        self.output("Add following net: " + net)
-        self.add_netblocks(netblock=net)
-	self.query('UPDATE netblocks SET admin=?, netname=?, country=?, description=? WHERE netblock=?',(admin, netname,country,description, net))
+        for net in inetnum_to_cidrs(inetnum):
+            self.output("Add following net: " + net)
+            self.queue_row('netblocks', netblock_row(net, ripe_object, admin=admin, description=description), update=('netblock',))
 #        print str(data["objects"]['object'][0]['link']['href'])
-
-# Parse string
-    def parse_inetnum_to_cidr(self,inetnum):
-#        print "\nPassed string: "+inetnum
-        matches = re.findall('((\d{1,3}\.?){4})',inetnum)
-
-#        print "\nFound "+str(len(matches))+" IPs"
-#        for match in matches:
-#            self.output("Matched IP: "+str(match[0]))
-
-        if len(matches) == 2:
-            start = matches[0][0]
-            end = matches[1][0]
-            if(len(start.split(".")) == len(end.split("."))):
-                int_start = map(int, start.split("."))
-                int_end = map(int, end.split("."))
-#                print("Start IP:"+str(len(int_start)))
-                number_start = 0
-                number_end = 0
-
-                for i in range(0,4):
-                    number_start += int_start[i]*256**(3-i)
-                    number_end += int_end[i]*256**(3-i)
-
-                number =number_end - number_start +1
-                cidr = int(32 - math.log(number,2))
-#                print("Inetnum: "+str(inetnum)+" Number: "+ str(number)+" CIDR: "+str(cidr))
-                net = str(start)+"/"+str(cidr)
-                return net
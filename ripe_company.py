@@ -5,14 +5,20 @@ from recon.core.module import BaseModule
 from recon.mixins.resolver import ResolverMixin
 from recon.mixins.threads import ThreadingMixin
 # module specific imports
-from urlparse import urlparse
+from urllib.parse import urlparse
 import os
 import json
 import re
 import ipaddress
 import math
+import sys
 
-class Module(BaseModule, ResolverMixin, ThreadingMixin):
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ripelib.client import CachedRequestMixin, REST_SEARCH_URL, RequestFailed
+from ripelib.rpsl import parse_rest_response
+from ripelib.source import StreamingSourceMixin
+
+class Module(StreamingSourceMixin, BaseModule, ResolverMixin, ThreadingMixin, CachedRequestMixin):
 
     # modules are defined and configured by the "meta" class variable
     # "meta" is a dictionary that contains information about the module, ranging from basic information, to input that affects how the module functions
@@ -25,6 +31,20 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
         'version': 'v0.0.2',
         'description': 'Resolves maintainer of networks and updates the database with the results.',
         'query': 'SELECT DISTINCT netblock FROM netblocks WHERE netblock IS NOT NULL',
+        'options': (
+            ('cache', True, False, 'cache responses in ripe_cache.db in the workspace'),
+            ('cache_size', 64, False, 'maximum size of the response cache in MB'),
+            ('rate', 10, False, 'maximum number of requests per second per host (0 = unlimited)'),
+            ('burst', 10, False, 'number of requests allowed at once before the rate applies'),
+            ('retries', 3, False, 'number of times a throttled or timed out item is requeued'),
+            ('incremental', False, False, 'only process inputs not resolved by an earlier run (progress in ripe_progress.db)'),
+            ('max_age', 30, False, 'days after which an input resolved earlier is processed again in incremental runs (0 = never)'),
+            ('backend', 'remote', False, 'remote: query the RIPE REST API, local: use the mirror loaded by ripe_mirror'),
+            ('mirror', '', False, 'path of the local mirror database (default: ripe_mirror.db in the workspace)'),
+            ('engine', 'threads', False, 'request engine: threads or async (keep-alive connection pool)'),
+            ('concurrency', 32, False, 'maximum number of in-flight requests of the async engine'),
+            ('connections', 4, False, 'maximum number of persistent connections per host of the async engine'),
+        ),
     }
     #search_result = ""
     # "query" is optional and determines the "default" source of input
@@ -38,24 +58,26 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
 
 # Send request to RIPE
     def ripe_request(self, Query, searchType, searchAttr):
+        if self.options['backend'] == 'local':
+            objects = self.mirror_search(Query, searchType)
+            return objects[0].value(searchAttr) if objects else ""
 
-        resp = self.request('https://rest.db.ripe.net/search.json?query-string='+Query+'&type-filter='+searchType+'&flags=no-irt&flags=no-filtering&flags=no-referenced', method='GET', headers={'Accept': 'application/json'})
+        resp = self.cached_request(REST_SEARCH_URL, [('query-string', Query), ('type-filter', searchType), ('flags', 'no-irt'), ('flags', 'no-filtering'), ('flags', 'no-referenced')])
 
-    	if resp.status_code != 200:
-    	    self.output('Got error response:'+str(resp.status_code))
-            exit
+        if not self.check_response(resp, Query):
+            return ""
 
-        data = json.loads(resp.text,"UTF-8")
-        resp_type = data["objects"]["object"][0]["type"]
-        if resp_type != searchType:
-            print("something got wrong, there is no "+str(searchType)+" in response, instead this object is of type "+str(resp_type))
-            exit
+        try:
+            ripe_object = parse_rest_response(resp.text)[0]
+        except ValueError:
+            raise RequestFailed("Could not find a valid JSON in response!")
+        except IndexError:
+            return ""
+        if ripe_object.type != searchType:
+            print("something got wrong, there is no "+str(searchType)+" in response, instead this object is of type "+str(ripe_object.type))
+            return ""
 
-        result = ""
-        for attribute in data["objects"]["object"][0]["attributes"]["attribute"]:
-            name = attribute["name"]
-            if name == searchAttr:
-                    result += attribute["value"]
+        result = ripe_object.value(searchAttr)
 
         print("I searched for attribute "+str(searchAttr)+" and of type "+str(searchType)+" and found "+str(result))
         return result
@@ -78,7 +100,7 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
         # "self.thread" takes at least one argument
         # the first argument must be an iterable that contains all of the items to fill the queue
         # all other arguments get blindly passed to the "module_thread" method where they can be accessed at the thread level
-        self.thread(nets)
+        self.dispatch(nets)
 
     # optional method
     # the first received parameter is required to capture an item from the queue
@@ -88,7 +110,7 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
         # do something leveraging the api methods discussed below
 
         company = self.ripe_request(net, "inetnum", "descr")
-	self.output("Due to many info in netblock description, there may be some junk or other info...")
+        self.output("Due to many info in netblock description, there may be some junk or other info...")
         self.output("I did found "+company)
 
 #        admin_role = self.ripe_request(admin_handle, "role", "admin-c")
@@ -98,29 +120,4 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
 
 #        net = self.parse_inetnum_to_cidr(str(inetnum))
 #        self.output("Add following net: " + net)
-        self.add_companies(company,"")
-
-# Parse string
-    def parse_inetnum_to_cidr(self,inetnum):
-#        print "\nPassed string: "+inetnum
-        matches = re.findall('((\d{1,3}\.?){4})',inetnum)
-
-        if len(matches) == 2:
-            start = matches[0][0]
-            end = matches[1][0]
-            if(len(start.split(".")) == len(end.split("."))):
-                int_start = map(int, start.split("."))
-                int_end = map(int, end.split("."))
-#                print("Start IP:"+str(len(int_start)))
-                number_start = 0
-                number_end = 0
-
-                for i in range(0,4):
-                    number_start += int_start[i]*256**(3-i)
-                    number_end += int_end[i]*256**(3-i)
-
-                number =number_end - number_start +1
-                cidr = int(32 - math.log(number,2))
-#                print("Inetnum: "+str(inetnum)+" Number: "+ str(number)+" CIDR: "+str(cidr))
-                net = str(start)+"/"+str(cidr)
-                return net
+        self.queue_row('companies', dict(company=company))
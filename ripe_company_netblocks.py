@@ -5,14 +5,22 @@ from recon.core.module import BaseModule
 from recon.mixins.resolver import ResolverMixin
 from recon.mixins.threads import ThreadingMixin
 # module specific imports
-from urlparse import urlparse
+from urllib.parse import urlparse
 import os
 import json
 import re
 import ipaddress
 import math
+import sys
 
-class Module(BaseModule, ResolverMixin, ThreadingMixin):
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ripelib.client import CachedRequestMixin, REST_SEARCH_URL, RequestFailed
+from ripelib.net import inetnum_to_cidrs
+from ripelib.netblocks import ensure_netblock_columns, netblock_row
+from ripelib.rpsl import parse_rest_response
+from ripelib.source import StreamingSourceMixin
+
+class Module(StreamingSourceMixin, BaseModule, ResolverMixin, ThreadingMixin, CachedRequestMixin):
 
     # modules are defined and configured by the "meta" class variable
     # "meta" is a dictionary that contains information about the module, ranging from basic information, to input that affects how the module functions
@@ -25,6 +33,20 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
         'version': 'v0.0.1',
         'description': 'Resolves netblocks of company.',
         'query': 'SELECT DISTINCT company FROM companies WHERE company IS NOT NULL',
+        'options': (
+            ('cache', True, False, 'cache responses in ripe_cache.db in the workspace'),
+            ('cache_size', 64, False, 'maximum size of the response cache in MB'),
+            ('rate', 10, False, 'maximum number of requests per second per host (0 = unlimited)'),
+            ('burst', 10, False, 'number of requests allowed at once before the rate applies'),
+            ('retries', 3, False, 'number of times a throttled or timed out item is requeued'),
+            ('incremental', False, False, 'only process inputs not resolved by an earlier run (progress in ripe_progress.db)'),
+            ('max_age', 30, False, 'days after which an input resolved earlier is processed again in incremental runs (0 = never)'),
+            ('backend', 'remote', False, 'remote: query the RIPE REST API, local: use the mirror loaded by ripe_mirror'),
+            ('mirror', '', False, 'path of the local mirror database (default: ripe_mirror.db in the workspace)'),
+            ('engine', 'threads', False, 'request engine: threads or async (keep-alive connection pool)'),
+            ('concurrency', 32, False, 'maximum number of in-flight requests of the async engine'),
+            ('connections', 4, False, 'maximum number of persistent connections per host of the async engine'),
+        ),
     }
     #search_result = ""
     # "query" is optional and determines the "default" source of input
@@ -49,28 +71,28 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
         resp = self.request('https://apps.db.ripe.net/search/full-text.html',method='POST',payload=payload)
 
 # Send JSON request to RIPE
-    def ripe_json_request(self, Query, searchType, searchAttr):
-
-        resp = self.request('https://rest.db.ripe.net/search.json?query-string='+Query+'&type-filter='+searchType+'&flags=no-irt&flags=no-filtering&flags=no-referenced', method='GET', headers={'Accept': 'application/json'})
+    def ripe_json_request(self, Query, searchType):
+        if self.options['backend'] == 'local':
+            objects = self.mirror_search(Query, searchType)
+            return objects[0] if objects else None
 
-    	if resp.status_code != 200:
-    	    self.output('Got error response:'+str(resp.status_code))
-            exit
+        resp = self.cached_request(REST_SEARCH_URL, [('query-string', Query), ('type-filter', searchType), ('flags', 'no-irt'), ('flags', 'no-filtering'), ('flags', 'no-referenced')])
 
-        data = json.loads(resp.text,"UTF-8")
-        resp_type = data["objects"]["object"][0]["type"]
-        if resp_type != searchType:
-            print("something got wrong, there is no "+str(searchType)+" in response, instead this object is of type "+str(resp_type))
-            exit
+        if not self.check_response(resp, Query):
+            return None
 
-        result = ""
-        for attribute in data["objects"]["object"][0]["attributes"]["attribute"]:
-            name = attribute["name"]
-            if name == searchAttr:
-                    result += attribute["value"]
-
-        print("I searched for attribute "+str(searchAttr)+" and of type "+str(searchType)+" and found "+str(result))
-        return result
+        try:
+            ripe_object = parse_rest_response(resp.text)[0]
+        except ValueError:
+            raise RequestFailed("Could not find a valid JSON in response!")
+        except IndexError:
+            return None
+        if ripe_object.type != searchType:
+            print("something got wrong, there is no "+str(searchType)+" in response, instead this object is of type "+str(ripe_object.type))
+            return None
+
+        print("I searched for object of type "+str(searchType)+" and found "+str(ripe_object.key))
+        return ripe_object
 
     # optional method
     def module_pre(self):
@@ -82,38 +104,17 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
     # the second parameter is required to capture the result of the "SOURCE" option, which means that it is only required if "query" is defined within "meta"
     # the third parameter is required if a value is returned from the "module_pre" method
     def module_run(self, companies, value):
-        self.thread(companies)
+        ensure_netblock_columns(self.query)
+        self.dispatch(companies)
 
     # optional method
     # the first received parameter is required to capture an item from the queue
     # all other parameters passed in to "self.thread" must be accounted for
     def module_thread(self, company):
-        ipv4_net = self.ripe_json_request(company, "inetnum", "inetnum")
-	net = self.parse_inetnum_to_cidr(str(ipv4_net))
+        ripe_object = self.ripe_json_request(company, "inetnum")
+        if ripe_object is None:
+            return
+        ipv4_net = ripe_object.key
         self.output("I did found "+ipv4_net)
-	self.add_netblocks(net)
-
-# Parse string
-    def parse_inetnum_to_cidr(self,inetnum):
-#        print "\nPassed string: "+inetnum
-        matches = re.findall('((\d{1,3}\.?){4})',inetnum)
-
-        if len(matches) == 2:
-            start = matches[0][0]
-            end = matches[1][0]
-            if(len(start.split(".")) == len(end.split("."))):
-                int_start = map(int, start.split("."))
-                int_end = map(int, end.split("."))
-#                print("Start IP:"+str(len(int_start)))
-                number_start = 0
-                number_end = 0
-
-                for i in range(0,4):
-                    number_start += int_start[i]*256**(3-i)
-                    number_end += int_end[i]*256**(3-i)
-
-                number =number_end - number_start +1
-                cidr = int(32 - math.log(number,2))
-#                print("Inetnum: "+str(inetnum)+" Number: "+ str(number)+" CIDR: "+str(cidr))
-                net = str(start)+"/"+str(cidr)
-                return net
+        for net in inetnum_to_cidrs(ipv4_net):
+            self.queue_row('netblocks', netblock_row(net, ripe_object), update=('netblock',))
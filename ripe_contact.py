@@ -5,14 +5,20 @@ from recon.core.module import BaseModule
 from recon.mixins.resolver import ResolverMixin
 from recon.mixins.threads import ThreadingMixin
 # module specific imports
-from urlparse import urlparse
+from urllib.parse import urlparse
 import os
 import json
 import re
 import ipaddress
 import math
+import sys
 
-class Module(BaseModule, ResolverMixin, ThreadingMixin):
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ripelib.client import CachedRequestMixin, REST_SEARCH_URL, RequestFailed
+from ripelib.rpsl import parse_rest_response
+from ripelib.source import StreamingSourceMixin
+
+class Module(StreamingSourceMixin, BaseModule, ResolverMixin, ThreadingMixin, CachedRequestMixin):
 
     # modules are defined and configured by the "meta" class variable
     # "meta" is a dictionary that contains information about the module, ranging from basic information, to input that affects how the module functions
@@ -25,6 +31,20 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
         'version': 'v0.0.2',
         'description': 'Resolves maintainer of networks and updates the database with the results.',
         'query': 'SELECT DISTINCT netblock FROM netblocks WHERE netblock IS NOT NULL',
+        'options': (
+            ('cache', True, False, 'cache responses in ripe_cache.db in the workspace'),
+            ('cache_size', 64, False, 'maximum size of the response cache in MB'),
+            ('rate', 10, False, 'maximum number of requests per second per host (0 = unlimited)'),
+            ('burst', 10, False, 'number of requests allowed at once before the rate applies'),
+            ('retries', 3, False, 'number of times a throttled or timed out item is requeued'),
+            ('incremental', False, False, 'only process inputs not resolved by an earlier run (progress in ripe_progress.db)'),
+            ('max_age', 30, False, 'days after which an input resolved earlier is processed again in incremental runs (0 = never)'),
+            ('backend', 'remote', False, 'remote: query the RIPE REST API, local: use the mirror loaded by ripe_mirror'),
+            ('mirror', '', False, 'path of the local mirror database (default: ripe_mirror.db in the workspace)'),
+            ('engine', 'threads', False, 'request engine: threads or async (keep-alive connection pool)'),
+            ('concurrency', 32, False, 'maximum number of in-flight requests of the async engine'),
+            ('connections', 4, False, 'maximum number of persistent connections per host of the async engine'),
+        ),
     }
     #search_result = ""
     # "query" is optional and determines the "default" source of input
@@ -42,34 +62,34 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
         except Exception as e:
             print("[*] Column most likely exists.  Error returned: " + str(e))
 
-	try:
-	    self.query("ALTER TABLE contacts ADD COLUMN handle TEXT")
-	except Exception as e:
-	    print("[*] Column most likely exists.  Error returned: " + str(e))
+        try:
+            self.query("ALTER TABLE contacts ADD COLUMN handle TEXT")
+        except Exception as e:
+            print("[*] Column most likely exists.  Error returned: " + str(e))
 
 # Send JSON request to RIPE
-    def ripe_json_request(self, Query, searchType, searchAttr):
+    def ripe_json_request(self, Query, searchType):
+        if self.options['backend'] == 'local':
+            objects = self.mirror_search(Query, searchType)
+            return objects[0] if objects else None
 
-        resp = self.request('https://rest.db.ripe.net/search.json?query-string='+Query+'&type-filter='+searchType+'&flags=no-irt&flags=no-filtering&flags=no-referenced', method='GET', headers={'Accept': 'application/json'})
+        resp = self.cached_request(REST_SEARCH_URL, [('query-string', Query), ('type-filter', searchType), ('flags', 'no-irt'), ('flags', 'no-filtering'), ('flags', 'no-referenced')])
 
-    	if resp.status_code != 200:
-    	    self.output('Got error response:'+str(resp.status_code))
-            exit
+        if not self.check_response(resp, Query):
+            return None
 
-        data = json.loads(resp.text,"UTF-8")
-        resp_type = data["objects"]["object"][0]["type"]
-        if resp_type != searchType:
-            print("something got wrong, there is no "+str(searchType)+" in response, instead this object is of type "+str(resp_type))
-            exit
-
-        result = ""
-        for attribute in data["objects"]["object"][0]["attributes"]["attribute"]:
-            name = attribute["name"]
-            if name == searchAttr:
-                    result += attribute["value"]
-
-        print("I searched for attribute "+str(searchAttr)+" and of type "+str(searchType)+" and found "+str(result))
-        return result
+        try:
+            ripe_object = parse_rest_response(resp.text)[0]
+        except ValueError:
+            raise RequestFailed("Could not find a valid JSON in response!")
+        except IndexError:
+            return None
+        if ripe_object.type != searchType:
+            print("something got wrong, there is no "+str(searchType)+" in response, instead this object is of type "+str(ripe_object.type))
+            return None
+
+        print("I searched for object of type "+str(searchType)+" and found "+str(ripe_object.key))
+        return ripe_object
 
     # optional method
     def module_pre(self):
@@ -90,7 +110,7 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
         # the first argument must be an iterable that contains all of the items to fill the queue
         # all other arguments get blindly passed to the "module_thread" method where they can be accessed at the thread level
         self.add_columns()
-        self.thread(nets)
+        self.dispatch(nets)
 
     # optional method
     # the first received parameter is required to capture an item from the queue
@@ -99,48 +119,28 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
         # never catch KeyboardInterrupt exceptions in the "module_thread" method as threads don't see them
         # do something leveraging the api methods discussed below
 
-        admin_handle = self.ripe_json_request(net, "inetnum", "admin-c")
+        inetnum = self.ripe_json_request(net, "inetnum")
+        if inetnum is None:
+            return
+        admin_handle = inetnum.value("admin-c")
         self.output("I did found "+admin_handle)
 
-#        admin_role = self.ripe_json_request(admin_handle, "role", "admin-c")
-#        self.output("I did found "+admin_role)
-        admin_name = self.ripe_json_request(admin_handle,"person","person")
-        admin_address = self.ripe_json_request(admin_handle,"person","address")
-        admin_phone = self.ripe_json_request(admin_handle,"person","phone")
-        admin_fax = self.ripe_json_request(admin_handle,"person","fax-no")
-	admin_mail = self.ripe_json_request(admin_handle,"person","e-mail")
+#        admin_role = self.ripe_json_request(admin_handle, "role")
+#        self.output("I did found "+admin_role.value("role"))
+        admin_person = self.ripe_json_request(admin_handle,"person")
+        if admin_person is None:
+            return
+        admin_name = admin_person.value("person")
+        admin_address = admin_person.value("address")
+        admin_phone = admin_person.value("phone")
+        admin_fax = admin_person.value("fax-no")
+        admin_mail = admin_person.value("e-mail")
         self.output("I did found "+admin_name+admin_address+admin_phone+admin_fax+admin_mail)
-	first_name = admin_name.split(" ",1)[0]
-	last_name = admin_name.rsplit(" ",1)[1]
-	middle_name = admin_name.strip(first_name).rstrip(last_name)
-	self.output("First: %s Middle: %s Last: %s" % (first_name, middle_name, last_name))
-        self.add_contacts(first_name=first_name, middle_name = middle_name, last_name=last_name)
-	self.query('UPDATE contacts SET email=?, phone=?, region=?, handle=? WHERE first_name=? AND last_name=?',(admin_mail, admin_phone,admin_address,admin_handle,first_name, last_name))
+        first_name = admin_name.split(" ",1)[0]
+        last_name = admin_name.rsplit(" ",1)[1]
+        middle_name = admin_name.strip(first_name).rstrip(last_name)
+        self.output("First: %s Middle: %s Last: %s" % (first_name, middle_name, last_name))
+        self.queue_row('contacts', dict(first_name=first_name, middle_name = middle_name, last_name=last_name, email=admin_mail, phone=admin_phone, region=admin_address, handle=admin_handle), update=('first_name', 'last_name'))
 #        net = self.parse_inetnum_to_cidr(str(inetnum))
 #        self.output("Add following net: " + net)
 #        self.add_netblocks(net)
-
-# Parse string
-    def parse_inetnum_to_cidr(self,inetnum):
-#        print "\nPassed string: "+inetnum
-        matches = re.findall('((\d{1,3}\.?){4})',inetnum)
-
-        if len(matches) == 2:
-            start = matches[0][0]
-            end = matches[1][0]
-            if(len(start.split(".")) == len(end.split("."))):
-                int_start = map(int, start.split("."))
-                int_end = map(int, end.split("."))
-#                print("Start IP:"+str(len(int_start)))
-                number_start = 0
-                number_end = 0
-
-                for i in range(0,4):
-                    number_start += int_start[i]*256**(3-i)
-                    number_end += int_end[i]*256**(3-i)
-
-                number =number_end - number_start +1
-                cidr = int(32 - math.log(number,2))
-#                print("Inetnum: "+str(inetnum)+" Number: "+ str(number)+" CIDR: "+str(cidr))
-                net = str(start)+"/"+str(cidr)
-                return net
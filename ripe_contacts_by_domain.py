@@ -11,8 +11,19 @@ import json
 import re
 import ipaddress
 import math
+import sys
 
-class Module(BaseModule, ResolverMixin, ThreadingMixin):
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ripelib.client import CachedRequestMixin
+from ripelib.fulltext import batch_members, count_match, fulltext_query
+from ripelib.source import StreamingSourceMixin
+
+# the attributes module_thread reads from the docs
+FIELDS = ('lookup-key', 'object-type', 'person', 'address', 'phone', 'fax-no', 'e-mail')
+# the attributes that tell which of a batch of domains a doc was found for
+MATCH_FIELDS = ('e-mail',)
+
+class Module(StreamingSourceMixin, BaseModule, ResolverMixin, ThreadingMixin, CachedRequestMixin):
 
     # modules are defined and configured by the "meta" class variable
     # "meta" is a dictionary that contains information about the module, ranging from basic information, to input that affects how the module functions
@@ -25,35 +36,28 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
         'version': 'v0.0.4',
         'description': 'Search maintainer and updates the database with the results.',
         'query': 'SELECT DISTINCT domain FROM domains WHERE domain IS NOT NULL',
+        'options': (
+            ('cache', True, False, 'cache responses in ripe_cache.db in the workspace'),
+            ('cache_size', 64, False, 'maximum size of the response cache in MB'),
+            ('rate', 10, False, 'maximum number of requests per second per host (0 = unlimited)'),
+            ('burst', 10, False, 'number of requests allowed at once before the rate applies'),
+            ('retries', 3, False, 'number of times a throttled or timed out item is requeued'),
+            ('incremental', False, False, 'only process inputs not resolved by an earlier run (progress in ripe_progress.db)'),
+            ('max_age', 30, False, 'days after which an input resolved earlier is processed again in incremental runs (0 = never)'),
+            ('batch', 20, False, 'number of domains combined into one full-text query (1 = one query each)'),
+            ('engine', 'threads', False, 'request engine: threads or async (keep-alive connection pool)'),
+            ('concurrency', 32, False, 'maximum number of in-flight requests of the async engine'),
+            ('connections', 4, False, 'maximum number of persistent connections per host of the async engine'),
+        ),
     }
 
-# Send full-text search request to RIPE
-    def ripe_search_request(self, Query, searchType):
-        result = [];
-        resp = self.request(url='https://apps.db.ripe.net/db-web-ui/api/rest/fulltextsearch/select?facet=true&format=json&hl=true&q=(e-mail:('+Query+'))%20AND%20(object-type:'+searchType+")",headers={'Accept': 'application/json'}, method='GET')
-#        resp = self.request(url='https://rest.db.ripe.net/search.json?query-string='+Query+'&type-filter='+searchType, headers={'Accept': 'application/json'}, method='GET')
+# Full-text query for a list of terms, also used by dispatch to plan the batches
+    def search_query(self, terms):
+        return fulltext_query(terms, "person", 'e-mail')
 
-        if resp.status_code == 200:
-            self.debug("Response:" + resp.text);
-            try:
-                data = json.loads(resp.text)
-                number_of_results = data["result"]["numFound"]
-                self.verbose("Number of results: "+str(number_of_results))
-                if number_of_results == 0:
-                    self.verbose("Nothing found");
-                    return result;
-                for i in range(number_of_results):
-                    self.debug("Result Nr:"+str(i)+" : "+str(data["result"]["docs"][i]))
-#                    resp_type = data["result"]["docs"][i]["strs"]["str"]["object-type"]
-#                    if resp_type != searchType:
-#                        self.error("something got wrong, there is no "+str(searchType)+" in response, instead this object is of type "+str(resp_type))
-#                    else:
-                    result.append(data["result"]["docs"][i]);
-            except ValueError as e:
-                self.error("Could not find a valid JSON in response!" + e.msg+" on line Nr: "+ e.pos+" :line: "+e.lineno)
-        else:
-            self.alert('Got error response: %s for search %s of type %s' % (str(resp.status_code), Query, searchType) )
-        return result
+# Send full-text search request to RIPE, yields the matching docs page by page
+    def ripe_search_request(self, terms):
+        return self.fulltext_search(self.search_query(terms), FIELDS)
 
     def json_search(self, json_obj, searchAttr):
         self.debug("Input JSON string:"+str(json_obj));
@@ -68,26 +72,31 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
         return result
 
     def module_run(self, domains):
-        self.thread(domains)
-
-    def module_thread(self, domain):
-        result_list_json = self.ripe_search_request(domain, "person")
+        self.dispatch(domains, batch=self.search_query)
 
-        for item in result_list_json:
-            admin_handle = self.json_search(item,"lookup-key")
-            self.output("I did found " + admin_handle)
+    def module_thread(self, domains):
+        terms = batch_members(domains)
+        found = dict.fromkeys(terms, 0)
+        for page in self.ripe_search_request(terms):
+            for item in page:
+                admin_handle = self.json_search(item,"lookup-key")
+                self.output("I did found " + admin_handle)
+                count_match(terms, found, item, MATCH_FIELDS, admin_handle, self.debug)
 
-            if (admin_handle != "" and self.json_search(item,"object-type") == "person"):
-                admin_name = self.json_search(item,"person")
-                admin_address = self.json_search(item,"address")
-                admin_phone = self.json_search(item,"phone")
-                admin_fax = self.json_search(item,"fax-no")
-                admin_mail = self.json_search(item,"e-mail")
+                if (admin_handle != "" and self.json_search(item,"object-type") == "person"):
+                    admin_name = self.json_search(item,"person")
+                    admin_address = self.json_search(item,"address")
+                    admin_phone = self.json_search(item,"phone")
+                    admin_fax = self.json_search(item,"fax-no")
+                    admin_mail = self.json_search(item,"e-mail")
 
-                self.output("I did found %s with address %s, phone %s, fax %s and mail %s" % (admin_name, admin_address, admin_phone, admin_fax, admin_mail))
-                first_name = admin_name.split(" ",1)[0]
-                last_name = admin_name.rsplit(" ",1)[1]
-                middle_name = admin_name.strip(first_name).rstrip(last_name)
+                    self.output("I did found %s with address %s, phone %s, fax %s and mail %s" % (admin_name, admin_address, admin_phone, admin_fax, admin_mail))
+                    first_name = admin_name.split(" ",1)[0]
+                    last_name = admin_name.rsplit(" ",1)[-1]
+                    middle_name = admin_name.strip(first_name).rstrip(last_name)
 
-                self.output("First: %s Middle: %s Last: %s" % (first_name, middle_name, last_name))
-                self.insert_contacts(first_name=first_name, middle_name = middle_name, last_name=last_name,email=admin_mail,notes=admin_handle)
+                    self.output("First: %s Middle: %s Last: %s" % (first_name, middle_name, last_name))
+                    self.queue_row('contacts', dict(first_name=first_name, middle_name = middle_name, last_name=last_name,email=admin_mail,notes=admin_handle))
+        for term in terms:
+            if not found[term]:
+                self.verbose("Nothing found for " + term)
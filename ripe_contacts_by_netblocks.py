@@ -11,8 +11,16 @@ import json
 import re
 import ipaddress
 import math
+import sys
 
-class Module(BaseModule, ResolverMixin, ThreadingMixin):
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ripelib.client import CachedRequestMixin, REST_SEARCH_URL, RequestFailed
+from ripelib.net import inetnum_to_cidrs, range_type
+from ripelib.netblocks import ensure_netblock_columns, netblock_row
+from ripelib.rpsl import parse_rest_response
+from ripelib.source import StreamingSourceMixin
+
+class Module(StreamingSourceMixin, BaseModule, ResolverMixin, ThreadingMixin, CachedRequestMixin):
 
     # modules are defined and configured by the "meta" class variable
     # "meta" is a dictionary that contains information about the module, ranging from basic information, to input that affects how the module functions
@@ -25,63 +33,104 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
         'version': 'v0.0.4',
         'description': 'Resolves maintainer of netblocks and updates the database with the results.',
         'query': 'SELECT DISTINCT netblock FROM netblocks WHERE netblock IS NOT NULL',
+        'options': (
+            ('referenced', False, False, 'read admin-c/tech-c contacts from the inetnum response instead of extra queries'),
+            ('cache', True, False, 'cache responses in ripe_cache.db in the workspace'),
+            ('cache_size', 64, False, 'maximum size of the response cache in MB'),
+            ('rate', 10, False, 'maximum number of requests per second per host (0 = unlimited)'),
+            ('burst', 10, False, 'number of requests allowed at once before the rate applies'),
+            ('retries', 3, False, 'number of times a throttled or timed out item is requeued'),
+            ('incremental', False, False, 'only process inputs not resolved by an earlier run (progress in ripe_progress.db)'),
+            ('max_age', 30, False, 'days after which an input resolved earlier is processed again in incremental runs (0 = never)'),
+            ('backend', 'remote', False, 'remote: query the RIPE REST API, local: use the mirror loaded by ripe_mirror'),
+            ('mirror', '', False, 'path of the local mirror database (default: ripe_mirror.db in the workspace)'),
+            ('engine', 'threads', False, 'request engine: threads or async (keep-alive connection pool)'),
+            ('concurrency', 32, False, 'maximum number of in-flight requests of the async engine'),
+            ('connections', 4, False, 'maximum number of persistent connections per host of the async engine'),
+        ),
     }
 
-# Send search request to RIPE
-    def ripe_search_request(self, Query, searchType):
-        result = ""
-        resp = self.request(url='https://rest.db.ripe.net/search.json?query-string='+Query+'&type-filter='+searchType+'&flags=no-irt&flags=no-filtering&flags=no-referenced', headers={'Accept': 'application/json'}, method='GET')
+# Send search request to RIPE, with referenced=True the person/role objects
+# referenced by the result are returned in the same response
+    def ripe_search_objects(self, Query, searchType, referenced=False):
+        if self.options['backend'] == 'local':
+            return self.mirror_search(Query, searchType, referenced)
+        result = []
+        params = [('query-string', Query), ('type-filter', searchType), ('flags', 'no-irt'), ('flags', 'no-filtering')]
+        if not referenced:
+            params.append(('flags', 'no-referenced'))
+        resp = self.cached_request(REST_SEARCH_URL, params, searchType)
 
-        if resp.status_code == 200:
+        if self.check_response(resp, Query):
             try:
-                data = json.loads(resp.text)
-                resp_type = data["objects"]["object"][0]["type"]
-                if resp_type != searchType:
-                    self.error("something got wrong, there is no "+str(searchType)+" in response, instead this object is of type "+str(resp_type))
-                else:
-                    result = resp.text
-            except:
-                self.error("Could not find a valid JSON in response!")
-        else:
-            self.alert('Got error response: %s for search %s of type %s' % (str(resp.status_code), Query, searchType) )
+                objects = parse_rest_response(resp.text)
+            except ValueError:
+                raise RequestFailed("Could not find a valid JSON in response!")
+            if objects and objects[0].type != searchType:
+                self.error("something got wrong, there is no "+str(searchType)+" in response, instead this object is of type "+str(objects[0].type))
+            elif objects:
+                result = objects
 
         return result
 
-    def json_search(self, json_string, searchAttr):
-        result = ""
-        if (json_string == ""):
-            return result
-        try:
-            data = json.loads(json_string)
-            for attribute in data["objects"]["object"][0]["attributes"]["attribute"]:
-                if attribute["name"] == searchAttr:
-                    result += attribute["value"]
-        except:
-            self.error("Could not find a valid JSON in response!")
-        return result
+    def ripe_search_request(self, Query, searchType):
+        objects = self.ripe_search_objects(Query, searchType)
+        return objects[0] if objects else None
 
     def module_run(self, nets):
-        self.thread(nets)
+        ensure_netblock_columns(self.query)
+        self.dispatch(nets)
 
     def module_thread(self, net):
-        json_admin_handle = self.ripe_search_request(net, "inetnum")
-        admin_handle = self.json_search(json_admin_handle,"admin-c")
+        if self.options['referenced']:
+            self.harvest_referenced(net)
+            return
+
+        inetnum = self.ripe_search_request(net, range_type(net))
+        if inetnum is None:
+            return
+        admin_handle = inetnum.value("admin-c")
 
         self.output("I did found " + admin_handle)
         if (admin_handle != ""):
 
             admin_person = self.ripe_search_request(admin_handle,"person")
-            if (admin_person != ""):
-                admin_name = self.json_search(admin_person,"person")
-                admin_address = self.json_search(admin_person,"address")
-                admin_phone = self.json_search(admin_person,"phone")
-                admin_fax = self.json_search(admin_person,"fax-no")
-                admin_mail = self.json_search(admin_person,"e-mail")
-
-                self.output("I did found %s with address %s, phone %s, fax %s and mail %s" % (admin_name, admin_address, admin_phone, admin_fax, admin_mail))
-                first_name = admin_name.split(" ",1)[0]
-                last_name = admin_name.rsplit(" ",1)[1]
-                middle_name = admin_name.strip(first_name).rstrip(last_name)
-
-                self.output("First: %s Middle: %s Last: %s" % (first_name, middle_name, last_name))
-                self.insert_contacts(first_name=first_name, middle_name = middle_name, last_name=last_name,email=admin_mail,notes=admin_handle)
+            if admin_person is not None:
+                self.insert_person(admin_handle, admin_person)
+
+# Read netblock, admin-c and tech-c contacts out of a single inetnum response
+    def harvest_referenced(self, net):
+        objects = self.ripe_search_objects(net, range_type(net), referenced=True)
+        if not objects:
+            return
+        inetnum = objects[0]
+        contacts = dict((ripe_object.key, ripe_object) for ripe_object in objects[1:] if ripe_object.type in ("person", "role"))
+
+        netname = inetnum.value("netname")
+        admin_handles = inetnum.getall("admin-c")
+        for netblock in inetnum_to_cidrs(inetnum.key):
+            self.output("Add following net: " + netblock)
+            self.queue_row('netblocks', netblock_row(netblock, inetnum, notes=netname + ", " + "".join(admin_handles) + ", "), update=('netblock',))
+
+        for handle in admin_handles + inetnum.getall("tech-c"):
+            contact = contacts.get(handle)
+            self.output("I did found " + handle)
+            if contact is None:
+                self.verbose("%s is not part of the response for %s" % (handle, net))
+            else:
+                self.insert_person(handle, contact)
+
+    def insert_person(self, handle, person):
+        admin_name = person.value("person") or person.value("role")
+        admin_address = person.value("address")
+        admin_phone = person.value("phone")
+        admin_fax = person.value("fax-no")
+        admin_mail = person.value("e-mail")
+
+        self.output("I did found %s with address %s, phone %s, fax %s and mail %s" % (admin_name, admin_address, admin_phone, admin_fax, admin_mail))
+        first_name = admin_name.split(" ",1)[0]
+        last_name = admin_name.rsplit(" ",1)[-1]
+        middle_name = admin_name.strip(first_name).rstrip(last_name)
+
+        self.output("First: %s Middle: %s Last: %s" % (first_name, middle_name, last_name))
+        self.queue_row('contacts', dict(first_name=first_name, middle_name = middle_name, last_name=last_name,email=admin_mail,notes=handle))
@@ -0,0 +1,55 @@
+# Module for recon-ng to assign hosts to the most specific netblock already stored in the workspace.
+# module required for framework integration
+from recon.core.module import BaseModule
+# module specific imports
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ripelib.trie import NetblockTrie
+
+class Module(BaseModule):
+
+    meta = {
+        'name': 'Host to Netblock Assignment',
+        'author': ' (@hljupkij)',
+        'version': '0.1',
+        'description': 'Annotates every host with the most specific netblock of the netblocks table containing its IP address, without querying RIPE.',
+        'options': (
+            ('missing', False, False, 'only annotate hosts without a netblock'),
+        ),
+    }
+
+    def module_pre(self):
+        # extend the "hosts"-table
+        try:
+            self.query("ALTER TABLE hosts ADD COLUMN netblock TEXT")
+        except Exception as e:
+            print("[*] Column in table most likely exists. Error returned: " + str(e))
+
+    def build_trie(self, conn):
+        trie = NetblockTrie()
+        skipped = 0
+        for (netblock,) in conn.execute('SELECT DISTINCT netblock FROM netblocks WHERE netblock IS NOT NULL'):
+            if not trie.add(netblock):
+                skipped += 1
+        self.output(f'{len(trie)} netblocks loaded, {skipped} invalid netblocks skipped.')
+        return trie
+
+    def module_run(self):
+        # one read of both tables and all updates in a single transaction
+        conn = sqlite3.connect(os.path.join(self.workspace, 'data.db'))
+        try:
+            trie = self.build_trie(conn)
+            query = 'SELECT rowid, ip_address FROM hosts WHERE ip_address IS NOT NULL'
+            if self.options['missing']:
+                query += ' AND netblock IS NULL'
+            lookup = trie.lookup
+            updates = [(lookup(ip), rowid) for rowid, ip in conn.execute(query).fetchall()]
+            with conn:
+                conn.executemany('UPDATE hosts SET netblock=? WHERE rowid=?', updates)
+        finally:
+            conn.close()
+        found = sum(1 for netblock, _ in updates if netblock is not None)
+        self.output(f'{found} of {len(updates)} hosts are covered by a stored netblock.')
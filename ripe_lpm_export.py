@@ -0,0 +1,44 @@
+# Module for recon-ng to export the resolved netblocks into a memory-mapped lookup database.
+# module required for framework integration
+from recon.core.module import BaseModule
+# module specific imports
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ripelib.intervals import get_index
+from ripelib.lpmdb import LPM_FILENAME, write_lpm
+from ripelib.netblocks import covering_object
+
+class Module(BaseModule):
+
+    meta = {
+        'name': 'RIPE Netblock Database Export',
+        'author': ' (@hljupkij)',
+        'version': '0.1',
+        'description': 'Writes the netblocks of the workspace with netname, country and admin-c into a read-only binary lookup file used by ripe_netblocks and robtex_ip.',
+        'options': (
+            ('filename', '', False, 'path of the database (default: ripe_netblocks.lpm in the workspace)'),
+        ),
+    }
+
+    def netblock_rows(self):
+        # the attribute columns of the netblocks table, or admin as ripe.py stored it before
+        columns = [row[1] for row in self.query('PRAGMA table_info(netblocks)')]
+        admin = 'admin_c' if 'admin_c' in columns else 'admin'
+        selected = ['netblock'] + [column if column in columns else "''" for column in ('netname', 'country', admin)]
+        inetnums = get_index(self.workspace)
+        for netblock, netname, country, admin in self.query('SELECT DISTINCT %s FROM netblocks WHERE netblock IS NOT NULL' % ', '.join(selected)):
+            if not (netname and country and admin):
+                # fall back to the inetnum the netblock was split from
+                ripe_object = covering_object(inetnums, netblock)
+                if ripe_object is not None:
+                    netname = netname or ripe_object.first('netname')
+                    country = country or ripe_object.first('country')
+                    admin = admin or ripe_object.first('admin-c')
+            yield (netblock, netname, country, admin)
+
+    def module_run(self):
+        filename = self.options['filename'] or os.path.join(self.workspace, LPM_FILENAME)
+        count = write_lpm(filename, self.netblock_rows())
+        self.output(f'{count} netblocks written to {filename}.')
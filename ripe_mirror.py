@@ -0,0 +1,46 @@
+# Module for recon-ng to load the RIPE split database dumps into a local mirror.
+# module required for framework integration
+from recon.core.module import BaseModule
+# module specific imports
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ripelib.mirror import DUMP_FILES, MIRROR_FILENAME, get_mirror
+
+class Module(BaseModule):
+
+    meta = {
+        'name': 'RIPE Mirror Loader',
+        'author': 'WP (@fandorin)',
+        'version': 'v0.0.1',
+        'description': 'Loads the RIPE split database dumps into a local mirror used by the RIPE modules with `backend` set to local.',
+        'comments': (
+            'Download the dumps from https://ftp.ripe.net/ripe/dbase/split/',
+            'Note: the person and role dumps are published with personal data removed.',
+        ),
+        'options': (
+            ('dumps', '', True, 'directory containing the ripe.db.*.gz split dump files'),
+            ('files', ','.join(DUMP_FILES), True, 'comma separated list of dump files to load'),
+            ('processes', 0, False, 'number of parser processes (0: one per CPU, 1: no multiprocessing)'),
+            ('mirror', '', False, 'path of the mirror database (default: ripe_mirror.db in the workspace)'),
+        ),
+    }
+
+    def module_run(self):
+        path = self.options['mirror'] or os.path.join(self.workspace, MIRROR_FILENAME)
+        mirror = get_mirror(path)
+        processes = int(self.options['processes'] or 0) or multiprocessing.cpu_count()
+        for filename in self.options['files'].split(','):
+            dump = os.path.join(self.options['dumps'], filename.strip())
+            if not os.path.exists(dump):
+                self.alert('Dump not found: ' + dump)
+                continue
+            self.output('Loading ' + dump)
+            started = time.time()
+            count = mirror.load_dump(dump, processes)
+            elapsed = time.time() - started
+            self.output('%d objects loaded from %s in %.1fs (%d objects/s)' % (count, filename, elapsed, count / max(elapsed, 0.001)))
+        self.output('Mirror stored in ' + path)
@@ -11,14 +11,23 @@ import json
 import re
 import ipaddress
 import math
+import sys
 
-class Module(BaseModule, ResolverMixin, ThreadingMixin):
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ripelib.client import CachedRequestMixin, REST_SEARCH_URL, RequestFailed
+from ripelib.intervals import get_index, save_index
+from ripelib.net import inetnum_to_cidrs, range_type
+from ripelib.netblocks import ensure_netblock_columns, netblock_row
+from ripelib.rpsl import parse_rest_response
+from ripelib.source import StreamingSourceMixin
+
+class Module(StreamingSourceMixin, BaseModule, ResolverMixin, ThreadingMixin, CachedRequestMixin):
 
     meta = {
         'name': 'RIPE Netblocks Resolver',
         'author': 'WP (@fandorin)',
         'version': 'v0.0.4',
-        'description': 'Resolves IP addresses to netblocks and updates the database with the results.',
+        'description': 'Resolves IPv4 and IPv6 addresses to netblocks and updates the database with the results.',
         'comments': (
             'Note: Nameserver must be in IP form.',
             '\te.g. 1.2.3.4',
@@ -26,21 +35,53 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
         'query': 'SELECT DISTINCT ip_address FROM hosts WHERE ip_address IS NOT NULL',
         'options': (
             ('nameserver', '8.8.8.8', 'yes', 'ip address of a valid nameserver'),
+            ('cache', True, False, 'cache responses in ripe_cache.db in the workspace'),
+            ('cache_size', 64, False, 'maximum size of the response cache in MB'),
+            ('rate', 10, False, 'maximum number of requests per second per host (0 = unlimited)'),
+            ('burst', 10, False, 'number of requests allowed at once before the rate applies'),
+            ('retries', 3, False, 'number of times a throttled or timed out item is requeued'),
+            ('incremental', False, False, 'only process inputs not resolved by an earlier run (progress in ripe_progress.db)'),
+            ('max_age', 30, False, 'days after which an input resolved earlier is processed again in incremental runs (0 = never)'),
+            ('backend', 'remote', False, 'remote: query the RIPE REST API, local: use the mirror loaded by ripe_mirror'),
+            ('mirror', '', False, 'path of the local mirror database (default: ripe_mirror.db in the workspace)'),
+            ('lpm', '', False, 'path of the netblock database written by ripe_lpm_export (default: ripe_netblocks.lpm in the workspace, used if it exists)'),
+            ('engine', 'threads', False, 'request engine: threads or async (keep-alive connection pool)'),
+            ('concurrency', 32, False, 'maximum number of in-flight requests of the async engine'),
+            ('connections', 4, False, 'maximum number of persistent connections per host of the async engine'),
         ),
     }
 
     def module_run(self, ips):
-        self.thread(ips)
+        ensure_netblock_columns(self.query)
+        self.inetnums = get_index(self.workspace)
+        self.lpm = self.lpm_database()
+        self.dispatch(ips)
+        save_index(self.workspace)
 
     def module_thread(self, ip):
         description = ""
-        json_resp = self.ripe_search_request(ip,"inetnum")
+        if self.lpm is not None:
+            record = self.lpm.lookup(ip)
+            if record is not None:
+                netblock, netname, country, admin = record
+                # the file is exported from the netblocks table, the row exists
+                self.verbose("%s is in exported netblock %s (%s, %s)" % (ip, netblock, netname, country))
+                return
+        ripe_object = self.inetnums.lookup(ip)
+        if ripe_object is not None:
+            # its netblocks were written when the range was resolved
+            self.verbose("%s is covered by already resolved %s" % (ip, ripe_object.key))
+            return
+        ripe_object = self.ripe_search_request(ip, range_type(ip))
+        if ripe_object is None:
+            return
+        self.inetnums.add_object(ripe_object)
 
-        inetnum = self.json_search(json_resp,"inetnum");
-        netname = self.json_search(json_resp,"netname");
-        descr = self.json_search(json_resp,"descr");
-        country = self.json_search(json_resp,"country");
-        admin = self.json_search(json_resp,"admin-c");
+        inetnum = ripe_object.key;
+        netname = ripe_object.value("netname");
+        descr = ripe_object.value("descr");
+        country = ripe_object.value("country");
+        admin = ripe_object.value("admin-c");
 
 #        for attribute in data["objects"]["object"][0]["attributes"]["attribute"]:
 #            name = attribute["name"]
@@ -61,65 +102,26 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
         description += admin + ", "
 
         self.output("I did found net with netname "+netname+" with IP range "+inetnum+" maintained by "+admin+" and located in "+country+" and following description: "+description)
-        net = self.parse_inetnum_to_cidr(str(inetnum))
-        self.output("Add following net: " + net)
-        self.insert_netblocks(netblock=net,notes=description)
+        for net in inetnum_to_cidrs(inetnum):
+            self.output("Add following net: " + net)
+            self.queue_row('netblocks', netblock_row(net, ripe_object, notes=description), update=('netblock',))
 
 # Send search request to RIPE
     def ripe_search_request(self, Query, searchType):
-        result = ""
-        resp = self.request(url='https://rest.db.ripe.net/search.json?query-string='+Query+'&type-filter='+searchType+'&flags=no-irt&flags=no-filtering&flags=no-referenced', headers={'Accept': 'application/json'}, method='GET')
+        if self.options['backend'] == 'local':
+            objects = self.mirror_search(Query, searchType)
+            return objects[0] if objects else None
+        result = None
+        resp = self.cached_request(REST_SEARCH_URL, [('query-string', Query), ('type-filter', searchType), ('flags', 'no-irt'), ('flags', 'no-filtering'), ('flags', 'no-referenced')])
 
-        if resp.status_code == 200:
+        if self.check_response(resp, Query):
             try:
-                data = json.loads(resp.text)
-                resp_type = data["objects"]["object"][0]["type"]
-                if resp_type != searchType:
-                    self.error("something got wrong, there is no "+str(searchType)+" in response, instead this object is of type "+str(resp_type))
-                else:
-                    result = resp.text
-            except:
-                self.error("Could not find a valid JSON in response!")
-        else:
-            self.alert('Got error response: %s for search %s of type %s' % (str(resp.status_code), Query, searchType) )
-
-        return result
+                objects = parse_rest_response(resp.text)
+            except ValueError:
+                raise RequestFailed("Could not find a valid JSON in response!")
+            if objects and objects[0].type != searchType:
+                self.error("something got wrong, there is no "+str(searchType)+" in response, instead this object is of type "+str(objects[0].type))
+            elif objects:
+                result = objects[0]
 
-# Load JSON string and search it for attribute
-    def json_search(self, json_string, searchAttr):
-        result = ""
-        if (json_string == ""):
-            return result
-        try:
-            data = json.loads(json_string)
-            for attribute in data["objects"]["object"][0]["attributes"]["attribute"]:
-                if attribute["name"] == searchAttr:
-                    result += attribute["value"]
-        except:
-            self.error("Could not find a valid JSON in response!")
         return result
-
-# Parse string
-    def parse_inetnum_to_cidr(self,inetnum):
-#        print "\nPassed string: "+inetnum
-        matches = re.findall('((\d{1,3}\.?){4})',inetnum)
-
-        if len(matches) == 2:
-            start = matches[0][0]
-            end = matches[1][0]
-            if(len(start.split(".")) == len(end.split("."))):
-                int_start = list(map(int, start.split(".")))
-                int_end = list(map(int, end.split(".")))
-#                print("Start IP:"+str(len(int_start)))
-                number_start = 0
-                number_end = 0
-
-                for i in range(0,4):
-                    number_start += int_start[i]*256**(3-i)
-                    number_end += int_end[i]*256**(3-i)
-
-                number =number_end - number_start +1
-                cidr = int(32 - math.log(number,2))
-#                print("Inetnum: "+str(inetnum)+" Number: "+ str(number)+" CIDR: "+str(cidr))
-                net = str(start)+"/"+str(cidr)
-                return net
@@ -0,0 +1,50 @@
+# Module for recon-ng to fill the range and attribute columns of netblocks stored by earlier versions of the RIPE modules.
+# module required for framework integration
+from recon.core.module import BaseModule
+# module specific imports
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ripelib.intervals import get_index
+from ripelib.netblocks import NETBLOCK_COLUMNS, covering_object, ensure_netblock_columns, netblock_row
+
+class Module(BaseModule):
+
+    meta = {
+        'name': 'RIPE Netblock Column Backfill',
+        'author': ' (@hljupkij)',
+        'version': '0.1',
+        'description': 'Adds start_int/end_int, netname, country, admin_c, tech_c and last_modified to the netblocks table and fills them for existing rows from the netblock and the already resolved inetnums.',
+        'options': (
+            ('all', False, False, 'process every row, not only rows without start_int'),
+        ),
+    }
+
+    def module_run(self):
+        # one read of the table and all updates in a single transaction
+        conn = sqlite3.connect(os.path.join(self.workspace, 'data.db'))
+        try:
+            ensure_netblock_columns(lambda query: conn.execute(query).fetchall())
+            columns = [column for column, _ in NETBLOCK_COLUMNS]
+            query = 'SELECT rowid, netblock, %s FROM netblocks WHERE netblock IS NOT NULL' % ', '.join(columns)
+            if not self.options['all']:
+                query += ' AND start_int IS NULL'
+            inetnums = get_index(self.workspace)
+            updates = []
+            for rowid, netblock, *values in conn.execute(query).fetchall():
+                row = netblock_row(netblock, covering_object(inetnums, netblock))
+                # keep what the modules already stored
+                current = dict((column, value) for column, value in zip(columns, values) if value is not None and value != '')
+                if self.options['all']:
+                    current.pop('start_int', None)
+                    current.pop('end_int', None)
+                row.update(current)
+                updates.append([row.get(column) for column in columns] + [rowid])
+            with conn:
+                conn.executemany('UPDATE netblocks SET %s WHERE rowid=?' % ', '.join('%s=?' % column for column in columns), updates)
+        finally:
+            conn.close()
+        found = sum(1 for update in updates if update[columns.index('netname')])
+        self.output(f'{len(updates)} netblocks updated, {found} of them with inetnum attributes.')
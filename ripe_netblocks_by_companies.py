@@ -11,8 +11,21 @@ import json
 import re
 import ipaddress
 import math
+import sys
 
-class Module(BaseModule, ResolverMixin, ThreadingMixin):
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ripelib.client import CachedRequestMixin
+from ripelib.fulltext import batch_members, count_match, fulltext_query
+from ripelib.net import RANGE_TYPES, inetnums_to_cidrs
+from ripelib.netblocks import ensure_netblock_columns, netblock_row
+from ripelib.source import StreamingSourceMixin
+
+# the attributes module_thread reads from the docs
+FIELDS = ('lookup-key', 'object-type', 'netname', 'descr', 'country', 'admin-c', 'tech-c', 'org', 'last-modified')
+# the attributes that tell which of a batch of companies a doc was found for
+MATCH_FIELDS = ('netname', 'descr', 'org')
+
+class Module(StreamingSourceMixin, BaseModule, ResolverMixin, ThreadingMixin, CachedRequestMixin):
 
     # modules are defined and configured by the "meta" class variable
     # "meta" is a dictionary that contains information about the module, ranging from basic information, to input that affects how the module functions
@@ -25,35 +38,28 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
         'version': 'v0.0.4',
         'description': 'Search netblocks by companies name and updates the database with the results.',
         'query': 'SELECT DISTINCT company FROM companies WHERE company IS NOT NULL',
+        'options': (
+            ('cache', True, False, 'cache responses in ripe_cache.db in the workspace'),
+            ('cache_size', 64, False, 'maximum size of the response cache in MB'),
+            ('rate', 10, False, 'maximum number of requests per second per host (0 = unlimited)'),
+            ('burst', 10, False, 'number of requests allowed at once before the rate applies'),
+            ('retries', 3, False, 'number of times a throttled or timed out item is requeued'),
+            ('incremental', False, False, 'only process inputs not resolved by an earlier run (progress in ripe_progress.db)'),
+            ('max_age', 30, False, 'days after which an input resolved earlier is processed again in incremental runs (0 = never)'),
+            ('batch', 20, False, 'number of companies combined into one full-text query (1 = one query each)'),
+            ('engine', 'threads', False, 'request engine: threads or async (keep-alive connection pool)'),
+            ('concurrency', 32, False, 'maximum number of in-flight requests of the async engine'),
+            ('connections', 4, False, 'maximum number of persistent connections per host of the async engine'),
+        ),
     }
 
-# Send full-text search request to RIPE
-    def ripe_search_request(self, Query, searchType):
-        result = [];
-        resp = self.request(url='https://apps.db.ripe.net/db-web-ui/api/rest/fulltextsearch/select?facet=true&format=json&hl=true&q=('+Query+')%20AND%20(object-type:'+searchType+")",headers={'Accept': 'application/json'}, method='GET')
-#        resp = self.request(url='https://rest.db.ripe.net/search.json?query-string='+Query+'&type-filter='+searchType, headers={'Accept': 'application/json'}, method='GET')
+# Full-text query for a list of terms, also used by dispatch to plan the batches
+    def search_query(self, terms):
+        return fulltext_query(terms, "(" + " OR ".join(RANGE_TYPES) + ")")
 
-        if resp.status_code == 200:
-            self.debug("Response:" + resp.text);
-            try:
-                data = json.loads(resp.text)
-                number_of_results = data["result"]["numFound"]
-                self.verbose("Number of results: "+str(number_of_results))
-                if number_of_results == 0:
-                    self.verbose("Nothing found");
-                    return result;
-                for i in range(number_of_results):
-                    self.debug("Result Nr:"+str(i)+" : "+str(data["result"]["docs"][i]))
-#                    resp_type = data["result"]["docs"][i]["strs"]["str"]["object-type"]
-#                    if resp_type != searchType:
-#                        self.error("something got wrong, there is no "+str(searchType)+" in response, instead this object is of type "+str(resp_type))
-#                    else:
-                    result.append(data["result"]["docs"][i]);
-            except ValueError as e:
-                self.error("Could not find a valid JSON in response!" + e.msg+" on line Nr: "+ e.pos+" :line: "+e.lineno)
-        else:
-            self.alert('Got error response: %s for search %s of type %s' % (str(resp.status_code), Query, searchType) )
-        return result
+# Send full-text search request to RIPE, yields the matching docs page by page
+    def ripe_search_request(self, terms):
+        return self.fulltext_search(self.search_query(terms), FIELDS)
 
     def json_search(self, json_obj, searchAttr):
         self.debug("Input JSON string:"+str(json_obj));
@@ -68,50 +74,33 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
         return result
 
     def module_run(self, company):
-        self.thread(company)
-
-    def module_thread(self, company):
-        result_list_json = self.ripe_search_request(company, "inetnum")
-
-        for item in result_list_json:
-            net_handle = self.json_search(item,"lookup-key")
-            netblock = self.parse_inetnum_to_cidr(net_handle)
-            self.output("I did found " + net_handle)
-
-            if (net_handle != "" and self.json_search(item,"object-type") == "inetnum"):
-                admin_handle = self.json_search(item,"admin-c")
-                tech_handle = self.json_search(item,"tech-c")
-                netname = self.json_search(item,"netname")
-                country = self.json_search(item,"country")
-                description = self.json_search(item,"descr")
-
-                last_modified = self.json_search(item,"last-modified")
-
-                notes = "%s, %s, %s, %s, %s" % (netname, description, country, admin_handle, tech_handle)
+        ensure_netblock_columns(self.query)
+        self.dispatch(company, batch=self.search_query)
+
+    def module_thread(self, companys):
+        terms = batch_members(companys)
+        found = dict.fromkeys(terms, 0)
+        for page in self.ripe_search_request(terms):
+            net_handles = [self.json_search(item,"lookup-key") for item in page]
+            netblock_lists = inetnums_to_cidrs(net_handles)
+
+            for item, net_handle, netblocks in zip(page, net_handles, netblock_lists):
+                self.output("I did found " + net_handle)
+                count_match(terms, found, item, MATCH_FIELDS, net_handle, self.debug)
+
+                if (net_handle != "" and self.json_search(item,"object-type") in RANGE_TYPES):
+                    admin_handle = self.json_search(item,"admin-c")
+                    tech_handle = self.json_search(item,"tech-c")
+                    netname = self.json_search(item,"netname")
+                    country = self.json_search(item,"country")
+                    description = self.json_search(item,"descr")
+
+                    last_modified = self.json_search(item,"last-modified")
+
+                    notes = "%s, %s, %s, %s, %s" % (netname, description, country, admin_handle, tech_handle)
 #                self.output("First: %s Middle: %s Last: %s" % (first_name, middle_name, last_name))
-                self.insert_netblocks(netblock=netblock,notes=notes)
-
-# Parse string
-    def parse_inetnum_to_cidr(self,inetnum):
-#        print "\nPassed string: "+inetnum
-        matches = re.findall('((\d{1,3}\.?){4})',inetnum)
-
-        if len(matches) == 2:
-            start = matches[0][0]
-            end = matches[1][0]
-            if(len(start.split(".")) == len(end.split("."))):
-                int_start = list(map(int, start.split(".")))
-                int_end = list(map(int, end.split(".")))
-#                print("Start IP:"+str(len(int_start)))
-                number_start = 0
-                number_end = 0
-
-                for i in range(0,4):
-                    number_start += int_start[i]*256**(3-i)
-                    number_end += int_end[i]*256**(3-i)
-
-                number =number_end - number_start +1
-                cidr = int(32 - math.log(number,2))
-#                print("Inetnum: "+str(inetnum)+" Number: "+ str(number)+" CIDR: "+str(cidr))
-                net = str(start)+"/"+str(cidr)
-                return net
+                    for netblock in netblocks:
+                        self.queue_row('netblocks', netblock_row(netblock, netname=netname, country=country, admin_c=admin_handle, tech_c=tech_handle, last_modified=last_modified, notes=notes), update=('netblock',))
+        for term in terms:
+            if not found[term]:
+                self.verbose("Nothing found for " + term)
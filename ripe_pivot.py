@@ -0,0 +1,176 @@
+# Module for recon-ng to expand companies, contacts and netblocks recursively over the RIPE object graph.
+# module required for framework integration
+from recon.core.module import BaseModule
+# mixins for desired functionality
+from recon.mixins.resolver import ResolverMixin
+from recon.mixins.threads import ThreadingMixin
+# module specific imports
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ripelib.client import CachedRequestMixin, REST_SEARCH_URL, RequestFailed, RetryLater
+from ripelib.fulltext import doc_object, fulltext_query
+from ripelib.net import RANGE_TYPES, inetnums_to_cidrs, range_type
+from ripelib.netblocks import ensure_netblock_columns, netblock_row
+from ripelib.pivot import COMPANY, HANDLE, INVERSE_ATTRIBUTES, RANGE, Budget, Frontier, classify, links
+from ripelib.rpsl import parse_rest_response
+from ripelib.source import StreamingSourceMixin
+
+# the attributes read from the netblock docs of a company search
+FIELDS = ('lookup-key', 'object-type', 'netname', 'descr', 'country', 'admin-c', 'tech-c', 'mnt-by', 'org', 'last-modified')
+
+CONTACT_TYPES = ('person', 'role')
+
+
+class BudgetExhausted(Exception):
+    """Raised by cached_request once the request budget is used up."""
+
+
+class Module(StreamingSourceMixin, BaseModule, ResolverMixin, ThreadingMixin, CachedRequestMixin):
+
+    meta = {
+        'name': 'RIPE Recursive Pivot',
+        'author': ' (@hljupkij)',
+        'version': '0.1',
+        'description': 'Expands companies, handles, maintainers, organisations and netblocks breadth first over the RIPE object graph and stores the netblocks and contacts found.',
+        'query': 'SELECT DISTINCT company FROM companies WHERE company IS NOT NULL',
+        'options': (
+            ('depth', 2, False, 'number of pivots from the inputs (0 = only expand the inputs)'),
+            ('budget', 1000, False, 'maximum number of requests sent upstream, cache hits are free (0 = unlimited)'),
+            ('cache', True, False, 'cache responses in ripe_cache.db in the workspace'),
+            ('cache_size', 64, False, 'maximum size of the response cache in MB'),
+            ('rate', 10, False, 'maximum number of requests per second per host (0 = unlimited)'),
+            ('burst', 10, False, 'number of requests allowed at once before the rate applies'),
+            ('retries', 3, False, 'number of times a throttled or timed out item is requeued'),
+            ('backend', 'remote', False, 'remote: query the RIPE REST API, local: use the mirror loaded by ripe_mirror (no company search)'),
+            ('mirror', '', False, 'path of the local mirror database (default: ripe_mirror.db in the workspace)'),
+            ('engine', 'threads', False, 'request engine: threads or async (keep-alive connection pool)'),
+            ('concurrency', 32, False, 'maximum number of in-flight requests of the async engine'),
+            ('connections', 4, False, 'maximum number of persistent connections per host of the async engine'),
+        ),
+    }
+
+    def module_run(self, seeds):
+        ensure_netblock_columns(self.query)
+        self.frontier = Frontier()
+        self.budget = Budget(int(self.options['budget'] or 0))
+        self.unexpanded = 0
+        self._lock = threading.Lock()
+        for seed in seeds:
+            if str(seed).strip():
+                self.frontier.add(classify(seed))
+
+        depth = int(self.options['depth'] or 0)
+        level = 0
+        nodes = self.frontier.advance()
+        while nodes:
+            self.output('Pivot level %d: %d nodes' % (level, len(nodes)))
+            # the children of the last level are stored but not expanded
+            self.dispatch(nodes, level < depth)
+            if self.budget.exhausted:
+                break
+            level += 1
+            nodes = self.frontier.advance()
+
+        left = len(self.frontier.advance()) + self.unexpanded
+        self.output('%d objects visited with %d requests' % (len(self.frontier), self.budget.used))
+        if left:
+            self.alert('Request budget of %d used up, %d nodes were not expanded' % (self.budget.limit, left))
+
+    def module_thread(self, node, follow):
+        kind, value = node
+        try:
+            if kind == COMPANY:
+                self.search_company(value, follow)
+            elif kind == RANGE:
+                self.expand_range(value, follow)
+            else:
+                if kind == HANDLE:
+                    self.fetch_contact(value)
+                objects = self.inverse_search(value, INVERSE_ATTRIBUTES[kind])
+                self.store_netblocks([ripe_object for ripe_object in objects if self.frontier.visit((RANGE, ripe_object.key))], follow)
+        except BudgetExhausted:
+            with self._lock:
+                self.unexpanded += 1
+
+# Count every request that is not answered by the response cache against the budget
+    def cached_request(self, url, params=(), object_type=None):
+        if not self.budget.take():
+            raise BudgetExhausted()
+        resp = super(Module, self).cached_request(url, params, object_type)
+        if resp.from_cache:
+            self.budget.refund()
+        return resp
+
+# Netblocks whose attributes match a company name, page by page
+    def search_company(self, company, follow):
+        if self.options['backend'] == 'local':
+            self.verbose('The local mirror has no full-text search, skipping company ' + company)
+            return
+        for page in self.fulltext_search(fulltext_query([company], "(" + " OR ".join(RANGE_TYPES) + ")"), FIELDS):
+            objects = [doc_object(doc) for doc in page]
+            self.store_netblocks([ripe_object for ripe_object in objects if ripe_object.type in RANGE_TYPES and ripe_object.key and self.frontier.visit((RANGE, ripe_object.key))], follow)
+
+# The inetnum of an input range, with its contacts from the same response
+    def expand_range(self, net, follow):
+        if self.options['backend'] == 'local':
+            objects = self.mirror_search(net, range_type(net), referenced=True)
+        else:
+            objects = self.rest_objects([('query-string', net), ('type-filter', range_type(net)), ('flags', 'no-irt'), ('flags', 'no-filtering')], range_type(net))
+        if not objects or objects[0].type not in RANGE_TYPES:
+            return
+        self.frontier.visit((RANGE, objects[0].key))
+        self.store_netblocks(objects[:1], follow)
+        for ripe_object in objects[1:]:
+            if ripe_object.type in CONTACT_TYPES and self.frontier.visit(('contact', ripe_object.key)):
+                self.insert_person(ripe_object.key, ripe_object)
+
+    def fetch_contact(self, handle):
+        if not self.frontier.visit(('contact', handle)):
+            return
+        if self.options['backend'] == 'local':
+            objects = self.mirror_search(handle, 'person') or self.mirror_search(handle, 'role')
+        else:
+            try:
+                objects = self.rest_objects([('query-string', handle), ('type-filter', 'person'), ('type-filter', 'role'), ('flags', 'no-irt'), ('flags', 'no-filtering'), ('flags', 'no-referenced')], 'person')
+            except (RetryLater, RequestFailed, BudgetExhausted):
+                # the contact has to be fetched again by a later attempt
+                self.frontier.forget(('contact', handle))
+                raise
+        for ripe_object in objects:
+            if ripe_object.type in CONTACT_TYPES:
+                self.insert_person(handle, ripe_object)
+                return
+
+    def rest_objects(self, params, object_type):
+        resp = self.cached_request(REST_SEARCH_URL, params, object_type)
+        if not self.check_response(resp, params[0][1]):
+            return []
+        try:
+            return parse_rest_response(resp.text)
+        except ValueError:
+            raise RequestFailed("Could not find a valid JSON in response!")
+
+    def store_netblocks(self, objects, follow):
+        for ripe_object, netblocks in zip(objects, inetnums_to_cidrs([ripe_object.key for ripe_object in objects])):
+            netname = ripe_object.first("netname")
+            self.output("I did found " + ripe_object.key)
+            notes = "%s, %s, %s, %s, %s" % (netname, ripe_object.value("descr"), ripe_object.first("country"), ripe_object.value("admin-c"), ripe_object.value("tech-c"))
+            for netblock in netblocks:
+                self.queue_row('netblocks', netblock_row(netblock, ripe_object, notes=notes), update=('netblock',))
+            if follow:
+                for node in links(ripe_object):
+                    self.frontier.add(node)
+
+    def insert_person(self, handle, person):
+        admin_name = person.value("person") or person.value("role")
+        admin_mail = person.value("e-mail")
+
+        self.output("I did found %s with mail %s" % (admin_name, admin_mail))
+        first_name = admin_name.split(" ",1)[0]
+        last_name = admin_name.rsplit(" ",1)[-1]
+        middle_name = admin_name.strip(first_name).rstrip(last_name)
+
+        self.queue_row('contacts', dict(first_name=first_name, middle_name = middle_name, last_name=last_name,email=admin_mail,notes=handle))
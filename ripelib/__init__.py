@@ -0,0 +1,3 @@
+# Shared helpers for the recon-ng RIPE modules in this repository.
+# The modules add their own directory to sys.path and import from here, so
+# this package must be installed next to them in the recon-ng modules folder.
@@ -0,0 +1,63 @@
+# Adaptive concurrency (AIMD) per upstream host.
+# The in-flight limit grows additively while latency stays close to the
+# best seen latency and is cut multiplicatively on 429/5xx and timeouts.
+import threading
+import time
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+class AimdController(object):
+    """Gate with a dynamic in-flight limit between 'minimum' and 'maximum'."""
+
+    def __init__(self, maximum, minimum=1, initial=4, decrease=0.5, tolerance=2.0):
+        self.maximum = max(int(maximum), 1)
+        self.minimum = max(min(int(minimum), self.maximum), 1)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.decrease = decrease
+        self.tolerance = tolerance
+        self.baseline = None
+        self._in_flight = 0
+        self._last_cut = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self._in_flight >= int(self.limit):
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self, latency=None, overloaded=False):
+        """Give the slot back and adapt the limit to the request's outcome."""
+        with self._condition:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if overloaded:
+                # one cut per round trip, a burst of rejections counts once
+                if now - self._last_cut > (self.baseline or 1.0):
+                    self.limit = max(float(self.minimum), self.limit * self.decrease)
+                    self._last_cut = now
+            elif latency is not None:
+                if self.baseline is None or latency < self.baseline:
+                    self.baseline = latency
+                else:
+                    # let the baseline follow a slowly rising floor
+                    self.baseline *= 1.01
+                if latency <= self.baseline * self.tolerance:
+                    self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+
+
+def get_controller(host, maximum):
+    """Return the controller shared by every request to 'host'."""
+    with _controllers_lock:
+        controller = _controllers.get(host)
+        if controller is None:
+            controller = _controllers[host] = AimdController(maximum)
+        elif controller.maximum != maximum:
+            with controller._condition:
+                controller.maximum = max(int(maximum), 1)
+                controller.limit = min(controller.limit, float(controller.maximum))
+                controller._condition.notify_all()
+        return controller
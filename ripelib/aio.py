@@ -0,0 +1,152 @@
+# Asyncio HTTP engine for the RIPE modules.
+# One event loop thread owns a small pool of persistent HTTP/1.1 connections
+# per host and runs every request of a module run, bounded by a semaphore.
+# module_thread keeps its blocking style: the request is a coroutine on the
+# engine loop and the worker only waits for its result.
+import asyncio
+import ssl
+import threading
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+AsyncResponse = namedtuple('AsyncResponse', ['status_code', 'text', 'headers'])
+
+
+class HttpPool(object):
+    """Keep-alive connection pool, at most 'connections' sockets per host."""
+
+    def __init__(self, connections=4, concurrency=32, timeout=10, user_agent=None):
+        self.connections = connections
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.requests = 0
+        self.opened = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._idle = {}
+        self._slots = {}
+        self._ssl = ssl.create_default_context()
+
+    async def fetch(self, url, headers=None):
+        async with self._semaphore:
+            parts = urlsplit(url)
+            secure = parts.scheme == 'https'
+            host = parts.hostname
+            port = parts.port or (443 if secure else 80)
+            target = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+            key = (host, port, secure)
+            slots = self._slots.setdefault(key, asyncio.Semaphore(self.connections))
+            async with slots:
+                self.requests += 1
+                return await asyncio.wait_for(self._roundtrip(key, target, headers or {}), self.timeout)
+
+    async def _roundtrip(self, key, target, headers):
+        idle = self._idle.setdefault(key, [])
+        # a pooled connection may have been closed by the server, retry once on a fresh one
+        while idle:
+            reader, writer = idle.pop()
+            try:
+                return await self._exchange(key, reader, writer, target, headers)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+            except BaseException:
+                writer.close()
+                raise
+        reader, writer = await self._connect(key)
+        try:
+            return await self._exchange(key, reader, writer, target, headers)
+        except BaseException:
+            # timed out or cancelled by wait_for mid-exchange: the state of
+            # the connection is unknown, so it is closed instead of leaked
+            writer.close()
+            raise
+
+    async def _connect(self, key):
+        host, port, secure = key
+        self.opened += 1
+        if secure:
+            return await asyncio.open_connection(host, port, ssl=self._ssl, server_hostname=host)
+        return await asyncio.open_connection(host, port)
+
+    async def _exchange(self, key, reader, writer, target, headers):
+        host, port, secure = key
+        lines = ['GET %s HTTP/1.1' % target, 'Host: %s' % host, 'Connection: keep-alive']
+        if self.user_agent:
+            lines.append('User-Agent: %s' % self.user_agent)
+        lines.extend('%s: %s' % item for item in headers.items())
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('connection closed by peer')
+        version, status = status_line.decode('latin-1').split(None, 2)[:2]
+        response_headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').rstrip('\r\n')
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b''.join(chunks)
+            keep_alive = True
+        elif 'content-length' in response_headers:
+            body = await reader.readexactly(int(response_headers['content-length']))
+            keep_alive = True
+        else:
+            body = await reader.read()
+            keep_alive = False
+
+        if response_headers.get('connection', '').lower() == 'close' or version == 'HTTP/1.0':
+            keep_alive = False
+        if keep_alive:
+            self._idle.setdefault(key, []).append((reader, writer))
+        else:
+            writer.close()
+        return AsyncResponse(int(status), body.decode('utf-8', 'replace'), response_headers)
+
+    def close(self):
+        for idle in self._idle.values():
+            for reader, writer in idle:
+                writer.close()
+        self._idle = {}
+
+
+class AsyncEngine(object):
+    """Runs an HttpPool on an event loop in a background thread."""
+
+    def __init__(self, connections=4, concurrency=32, timeout=10, user_agent=None):
+        self.concurrency = concurrency
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self.pool = self.call(self._make_pool, connections, concurrency, timeout, user_agent)
+
+    @staticmethod
+    async def _make_pool(*args):
+        return HttpPool(*args)
+
+    def call(self, coro_function, *args):
+        return asyncio.run_coroutine_threadsafe(coro_function(*args), self._loop).result()
+
+    def fetch(self, url, headers=None):
+        """Blocking facade: run the request on the engine loop and wait for it."""
+        return self.call(self.pool.fetch, url, headers)
+
+    def close(self):
+        async def shutdown():
+            self.pool.close()
+        self.call(shutdown)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
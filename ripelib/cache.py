@@ -0,0 +1,117 @@
+# Persistent response cache shared by the RIPE and Robtex modules.
+# Responses are stored in a SQLite file in the workspace, keyed by endpoint
+# and request parameters, with per object type TTLs, negative entries for
+# 404/empty answers and LRU eviction once the size cap is reached.
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+CACHE_FILENAME = 'ripe_cache.db'
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# positive TTLs in seconds per object type, None is the fallback
+DEFAULT_TTLS = {
+    'inetnum': 7 * DAY,
+    'inet6num': 7 * DAY,
+    'organisation': 7 * DAY,
+    'person': 3 * DAY,
+    'role': 3 * DAY,
+    None: DAY,
+}
+NEGATIVE_TTL = 6 * HOUR
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+class ResponseCache(object):
+    """SQLite backed (status, body) cache with TTL and LRU size bound."""
+
+    def __init__(self, path, max_bytes, ttls=None, negative_ttl=NEGATIVE_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            endpoint TEXT, query TEXT, type_filter TEXT, flags TEXT,
+            status INTEGER, body BLOB, size INTEGER,
+            created REAL, expires REAL, accessed REAL)''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+        self._size = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    @staticmethod
+    def make_key(endpoint, params):
+        canonical = endpoint + '?' + '&'.join('%s=%s' % (name, value) for name, value in sorted(params))
+        return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return (status, text) for a live entry, or None."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute('SELECT status, body, expires FROM responses WHERE key=?', (key,)).fetchone()
+            if row is None or row[2] < now:
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE responses SET accessed=? WHERE key=?', (now, key))
+            self.hits += 1
+        return (row[0], zlib.decompress(row[1]).decode('utf-8'))
+
+    def put(self, key, endpoint, query, type_filter, flags, status, text, object_type=None):
+        """Store a response. 404 and empty bodies become negative entries."""
+        now = time.time()
+        if status == 404 or not text.strip():
+            ttl = self.negative_ttl
+        else:
+            ttl = self.ttls.get(object_type, self.ttls[None])
+        body = zlib.compress(text.encode('utf-8'))
+        with self._lock:
+            old = self._conn.execute('SELECT size FROM responses WHERE key=?', (key,)).fetchone()
+            self._conn.execute('INSERT OR REPLACE INTO responses VALUES (?,?,?,?,?,?,?,?,?,?,?)',
+                               (key, endpoint, query, type_filter, flags, status, body, len(body), now, now + ttl, now))
+            self._size += len(body) - (old[0] if old else 0)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # drop expired entries first, then least recently used ones down to 90% of the cap
+        self._conn.execute('BEGIN')
+        self._conn.execute('DELETE FROM responses WHERE expires < ?', (time.time(),))
+        size = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        target = self.max_bytes * 0.9
+        if size > target:
+            cursor = self._conn.execute('SELECT key, size FROM responses ORDER BY accessed')
+            victims = []
+            for key, entry_size in cursor:
+                if size <= target:
+                    break
+                victims.append((key,))
+                size -= entry_size
+            self._conn.executemany('DELETE FROM responses WHERE key=?', victims)
+        self._conn.execute('COMMIT')
+        self._size = size
+
+
+def get_cache(workspace, max_bytes):
+    """Return the cache shared by all modules working on 'workspace'."""
+    path = os.path.join(workspace, CACHE_FILENAME)
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = ResponseCache(path, max_bytes)
+            _caches[path] = cache
+        cache.max_bytes = max_bytes
+        return cache
@@ -0,0 +1,401 @@
+# Request helpers mixed into the RIPE and Robtex modules.
+import json
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+from .aimd import get_controller
+from .aio import AsyncEngine
+from .cache import DAY, get_cache
+from .fulltext import batch_members, plan_batches
+from .ledger import LEDGER_FILENAME, get_ledger
+from .lpmdb import LPM_FILENAME, open_lpm
+from .mirror import MIRROR_FILENAME, REFERENCE_ATTRIBUTES, get_mirror
+from .net import RANGE_TYPES
+from .ratelimit import get_limiter
+from .singleflight import get_flights
+from .rpsl import parse_rest_response
+from .writer import get_writer
+
+REST_SEARCH_URL = 'https://rest.db.ripe.net/search.json'
+FULLTEXT_SEARCH_URL = 'https://apps.db.ripe.net/db-web-ui/api/rest/fulltextsearch/select'
+
+# docs per page of a full-text search
+FULLTEXT_ROWS = 100
+
+# the parts of a request the cache entries are described by
+QUERY_PARAMS = ('query-string', 'q')
+
+# responses that mean the server is overloaded, the item is retried later
+OVERLOAD_STATUS = (429, 500, 502, 503, 504)
+
+CachedResponse = namedtuple('CachedResponse', ['status_code', 'text', 'from_cache'])
+
+
+class RetryLater(Exception):
+    """Raised by cached_request when the upstream throttles or times out."""
+
+
+class RequestFailed(Exception):
+    """Raised for an error response or a body that cannot be read. The item
+    is recorded as failed, so incremental runs process it again."""
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    """Exponential backoff with jitter, between half and the full step."""
+    step = min(cap, base * 2 ** (attempt - 1))
+    return random.uniform(step / 2, step)
+
+
+class CachedRequestMixin(object):
+    """Adds cached_request() and dispatch() to a recon-ng module.
+
+    The cache is controlled by the 'cache' and 'cache_size' options, the
+    request engine by 'engine', 'concurrency' and 'connections' and the
+    per host token bucket by 'rate' and 'burst' and requeueing of
+    throttled items by 'retries'. The in-flight requests per host are
+    adapted by an AIMD controller. With 'backend' set to 'local' lookups are
+    answered by the mirror built with the ripe_mirror module. Processed
+    items are recorded in the progress ledger; 'incremental' skips the
+    ones resolved within the last 'max_age' days. Full-text modules combine
+    up to 'batch' terms into one query.
+    """
+
+    _engine = None
+    _writer = None
+    _workers = 10
+    _skipped = 0
+
+    def dispatch(self, items, *args, batch=None):
+        """Run module_thread for every item, like self.thread().
+
+        With the 'engine' option set to 'async' the requests of all workers
+        are run on one event loop over a pool of keep-alive connections.
+        Items whose requests were throttled (RetryLater) are requeued with
+        jittered exponential backoff, up to 'retries' times. 'items' may be
+        any iterable; it is consumed lazily through a bounded queue.
+
+        'batch' is a function that builds the full-text query for a list of
+        terms; with it and the 'batch' option above 1 the items are grouped
+        into TermBatches and module_thread gets one batch at a time.
+        """
+        engine = None
+        workers = int(self._global_options.get('threads') or 10)
+        if self.options.get('engine') == 'async':
+            engine = AsyncEngine(connections=int(self.options.get('connections') or 4),
+                                 concurrency=int(self.options.get('concurrency') or 32),
+                                 timeout=self._global_options.get('timeout') or 10,
+                                 user_agent=self._global_options.get('user-agent'))
+            workers = engine.concurrency
+        self._engine = engine
+        self._workers = workers
+        ledger = get_ledger(self.workspace)
+        counts = self.row_writer().counts()
+        self._skipped = 0
+        if self.options.get('incremental'):
+            done = ledger.completed(self.ledger_module(), float(self.options.get('max_age') or 0) * DAY)
+            items = self._skip_items(items, done)
+        size = int(self.options.get('batch') or 1)
+        if batch is not None and size > 1:
+            items = plan_batches(items, batch, size)
+        try:
+            self._run_with_retries(items, args, workers)
+        finally:
+            self.flush_rows()
+            ledger.checkpoint()
+            self.report_rows(counts)
+            if self._skipped:
+                self.output('%d inputs resolved by earlier runs skipped' % self._skipped)
+            progress = ledger.summary(self.ledger_module())
+            if progress.get('failed'):
+                self.alert('%d inputs failed and are processed again by incremental runs (%d done)' % (progress['failed'], progress.get('done', 0)))
+            else:
+                self.verbose('%d inputs done in %s' % (progress.get('done', 0), LEDGER_FILENAME))
+            self._engine = None
+            if engine is not None:
+                engine.close()
+                self.verbose('%d requests over %d connections' % (engine.pool.requests, engine.pool.opened))
+
+    def _skip_items(self, items, done):
+        # only counts the skipped items, the input may not fit into memory
+        for item in items:
+            if str(item) in done:
+                self._skipped += 1
+            else:
+                yield item
+
+    def ledger_module(self):
+        return getattr(self, '_modulename', type(self).__module__).split('/')[-1]
+
+    def _run_with_retries(self, items, args, workers):
+        ledger = get_ledger(self.workspace)
+        module = self.ledger_module()
+        how = self.options.get('backend') or 'remote'
+        retries = int(self.options.get('retries') or 0)
+        pending = ((item, 0.0) for item in items)
+        attempt = 0
+
+        def record(item, status, outcome):
+            # a batch is recorded per term, so incremental runs skip terms
+            due = False
+            for term in batch_members(item):
+                due = ledger.record(module, term, status, outcome) or due
+            return due
+
+        while True:
+            failed = []
+            lock = threading.Lock()
+            # items waiting for or running in a worker, the input is only
+            # read as far ahead as this allows
+            slots = threading.BoundedSemaphore(2 * workers)
+
+            def work(entry):
+                try:
+                    run(entry)
+                finally:
+                    slots.release()
+
+            def run(entry):
+                item, delay = entry
+                if delay:
+                    time.sleep(delay)
+                try:
+                    self.module_thread(item, *args)
+                    due = record(item, 'done', how)
+                except RetryLater as e:
+                    self.debug('Requeue %s: %s' % (item, e))
+                    with lock:
+                        failed.append(item)
+                    return
+                except RequestFailed as e:
+                    self.alert('%s: %s' % (item, e))
+                    due = record(item, 'failed', str(e))
+                except Exception as e:
+                    self.print_exception()
+                    due = record(item, 'failed', '%s: %s' % (type(e).__name__, e))
+                if due:
+                    ledger.checkpoint(self.flush_rows)
+
+            executor = ThreadPoolExecutor(max_workers=workers)
+            try:
+                for entry in pending:
+                    slots.acquire()
+                    executor.submit(work, entry)
+                executor.shutdown()
+            except KeyboardInterrupt:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+
+            if not failed:
+                break
+            attempt += 1
+            if attempt > retries:
+                for item in failed:
+                    self.error('Giving up on %s after %d retries' % (item, retries))
+                    record(item, 'failed', 'throttled')
+                break
+            self.alert('%d items throttled, retry %d of %d' % (len(failed), attempt, retries))
+            pending = [(item, backoff_delay(attempt)) for item in failed]
+
+    def queue_row(self, table, data, update=None):
+        """Queue a result row for the batched writer of the workspace.
+
+        Without 'update' this behaves like the insert_<table> helpers; with a
+        tuple of key columns the matching rows get the other columns of
+        'data' instead of an insert followed by an UPDATE.
+        """
+        data['module'] = getattr(self, '_modulename', '').split('/')[-1]
+        self.row_writer().put(table, data, update)
+
+    def row_writer(self):
+        if self._writer is None:
+            self._writer = get_writer(os.path.join(self.workspace, 'data.db'))
+        return self._writer
+
+    def flush_rows(self):
+        writer = self._writer
+        if writer is None:
+            return
+        writer.flush()
+        for error in writer.errors:
+            self.error(error)
+        del writer.errors[:]
+
+    def report_rows(self, before):
+        """Output the rows added and updated since the counts 'before', like
+        the summary recon-ng shows for its insert_<table> helpers."""
+        inserted, updated = self.row_writer().counts()
+        reported = False
+        for table in sorted(set(inserted) | set(updated)):
+            new = inserted.get(table, 0) - before[0].get(table, 0)
+            changed = updated.get(table, 0) - before[1].get(table, 0)
+            if new or changed:
+                self.output('SUMMARY: %d new and %d updated %s.' % (new, changed, table))
+                reported = True
+        if not reported:
+            self.output('SUMMARY: no new or updated rows.')
+
+    def local_mirror(self):
+        path = self.options.get('mirror') or os.path.join(self.workspace, MIRROR_FILENAME)
+        return get_mirror(path)
+
+    def lpm_database(self):
+        """Return the netblock database written by ripe_lpm_export, or None."""
+        path = self.options.get('lpm') or os.path.join(self.workspace, LPM_FILENAME)
+        return open_lpm(path)
+
+    def mirror_search(self, query, object_type, referenced=False):
+        """Look up query/type in the local mirror, like a REST search."""
+        objects = self.local_mirror().search(query, object_type, referenced)
+        if not objects:
+            self.verbose('No %s for %s in the local mirror' % (object_type, query))
+        return objects
+
+    def check_response(self, resp, query):
+        """Return True for a 200 and False for a 404 (nothing found) response,
+        raise RequestFailed for any other status."""
+        if resp.status_code == 404:
+            self.verbose('Nothing found for %s' % query)
+            return False
+        if resp.status_code != 200:
+            raise RequestFailed('Got error response: %s for %s' % (resp.status_code, query))
+        return True
+
+    def inverse_search(self, value, attributes=REFERENCE_ATTRIBUTES, object_types=RANGE_TYPES):
+        """Return the objects of 'object_types' whose 'attributes' reference
+        the handle 'value', as a list of RpslObject.
+
+        Remote lookups send one REST inverse query for all attributes and
+        types, which returns the complete result in one cacheable response.
+        With 'backend' set to 'local' the mirror is asked instead.
+        """
+        if self.options.get('backend') == 'local':
+            mirror = self.local_mirror()
+            objects, seen = [], set()
+            for name in attributes:
+                for object_type in object_types:
+                    for ripe_object in mirror.inverse(name, value, object_type):
+                        if (ripe_object.type, ripe_object.key) not in seen:
+                            seen.add((ripe_object.type, ripe_object.key))
+                            objects.append(ripe_object)
+            return objects
+        params = [('query-string', value)]
+        params += [('inverse-attribute', name) for name in attributes]
+        params += [('type-filter', object_type) for object_type in object_types]
+        params += [('flags', 'no-irt'), ('flags', 'no-filtering'), ('flags', 'no-referenced')]
+        resp = self.cached_request(REST_SEARCH_URL, params)
+        # the REST API answers an empty result with 404
+        if not self.check_response(resp, value):
+            return []
+        try:
+            objects = parse_rest_response(resp.text)
+        except ValueError:
+            raise RequestFailed('Could not find a valid JSON in response!')
+        return [ripe_object for ripe_object in objects if ripe_object.type in object_types]
+
+    def response_cache(self):
+        if not self.options.get('cache'):
+            return None
+        size = int(self.options.get('cache_size') or 64)
+        return get_cache(self.workspace, size * 1024 * 1024)
+
+    def rate_limit(self, url):
+        """Wait for a token of the bucket shared by all requests to url's host."""
+        rate = float(self.options.get('rate') or 0)
+        if rate <= 0:
+            return
+        host = urlsplit(url).hostname
+        waited = get_limiter(host, rate, self.options.get('burst') or 1).acquire()
+        if waited:
+            self.debug('Waited %.2fs for %s rate limit' % (waited, host))
+
+    def cached_request(self, url, params=(), object_type=None):
+        """GET 'url' with the query 'params' (list of name/value pairs).
+
+        Returns an object with status_code and text like self.request does,
+        served from the workspace response cache when possible. Concurrent
+        calls for the same URL share one request; from_cache is set for
+        every response that was not requested by this call.
+        """
+        params = list(params)
+        type_filter = ','.join(value for name, value in params if name == 'type-filter')
+        if object_type is None:
+            object_type = type_filter.split(',')[0] or None
+        cache = self.response_cache()
+        if cache is not None:
+            key = cache.make_key(url, params)
+            hit = cache.get(key)
+            if hit is not None:
+                self.debug('Cache hit for %s' % (url + '?' + urlencode(params)))
+                return CachedResponse(hit[0], hit[1], True)
+        else:
+            key = None
+        full_url = url + '?' + urlencode(params) if params else url
+        resp, shared = get_flights().do(full_url, lambda: self._fetch(url, params, full_url, cache, key, object_type))
+        if shared:
+            self.debug('Shared in-flight request for %s' % full_url)
+            return resp._replace(from_cache=True)
+        return resp
+
+    def _fetch(self, url, params, full_url, cache, key, object_type):
+        if cache is not None:
+            # a request for the same URL may have completed since the lookup
+            hit = cache.get(key)
+            if hit is not None:
+                return CachedResponse(hit[0], hit[1], True)
+        host = urlsplit(full_url).hostname
+        controller = get_controller(host, self._workers)
+        controller.acquire()
+        try:
+            self.rate_limit(full_url)
+            started = time.monotonic()
+            if self._engine is not None:
+                resp = self._engine.fetch(full_url, {'Accept': 'application/json'})
+            else:
+                resp = self.request(url=full_url, headers={'Accept': 'application/json'}, method='GET')
+        except Exception as e:
+            controller.release(overloaded=True)
+            raise RetryLater('%s: %s' % (type(e).__name__, e))
+        overloaded = resp.status_code in OVERLOAD_STATUS
+        controller.release(time.monotonic() - started, overloaded)
+        if overloaded:
+            raise RetryLater('got %d from %s' % (resp.status_code, host))
+        if cache is not None and resp.status_code in (200, 404):
+            type_filter = ','.join(value for name, value in params if name == 'type-filter')
+            query = ''.join(value for name, value in params if name in QUERY_PARAMS)
+            flags = ','.join(value for name, value in params if name == 'flags')
+            cache.put(key, url, query, type_filter, flags, resp.status_code, resp.text, object_type)
+        return CachedResponse(resp.status_code, resp.text, False)
+
+    def fulltext_search(self, q, fields=(), rows=FULLTEXT_ROWS):
+        """Run a full-text search and yield its docs one page at a time.
+
+        Pages are requested with explicit start/rows until numFound docs
+        were read; with 'fields' the docs only carry those attributes (fl).
+        """
+        start = 0
+        while True:
+            params = [('format', 'json'), ('q', q), ('start', str(start)), ('rows', str(rows))]
+            if fields:
+                params.append(('fl', ','.join(fields)))
+            resp = self.cached_request(FULLTEXT_SEARCH_URL, params)
+            if not self.check_response(resp, q):
+                return
+            try:
+                result = json.loads(resp.text)['result']
+                found = int(result['numFound'])
+                docs = result.get('docs') or []
+            except (ValueError, KeyError, TypeError):
+                raise RequestFailed('Could not find a valid JSON in response!')
+            if start == 0:
+                self.verbose('Number of results: %d' % found)
+            if not docs:
+                return
+            yield docs
+            start += len(docs)
+            if start >= found:
+                return
@@ -0,0 +1,26 @@
+# SQL and matchers used by the deduplicate module, kept here so they can be
+# benchmarked without a recon-ng installation.
+import re
+
+
+def delete_duplicates_query(table, key, column):
+    """One statement that keeps the lowest rowid of every (key, column) group."""
+    return f'DELETE FROM "{table}" WHERE rowid NOT IN (SELECT MIN(rowid) FROM "{table}" GROUP BY {key}, {column})'
+
+
+def count_duplicates_query(table, key, column):
+    """Count the rows delete_duplicates_query would remove."""
+    return f'SELECT COUNT(rowid) FROM "{table}" WHERE rowid NOT IN (SELECT MIN(rowid) FROM "{table}" GROUP BY {key}, {column})'
+
+
+def compile_patterns(lines):
+    """Compile the lines of a filter file into one case-insensitive matcher.
+
+    A row matches if its value contains any of the lines, like the
+    per-line LIKE '%line%' queries did. Lines are stripped of trailing
+    whitespace like in row mode, empty lines are skipped.
+    """
+    patterns = sorted(set(line.rstrip() for line in lines) - {''}, key=len, reverse=True)
+    if not patterns:
+        return None
+    return re.compile('|'.join(re.escape(pattern) for pattern in patterns), re.IGNORECASE)
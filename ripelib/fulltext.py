@@ -0,0 +1,130 @@
+# Batching of full-text search terms.
+# The full-text modules send one query per company, handle or domain. The
+# planner here combines many of them into one "((a) OR (b) ...)" query that
+# still fits into a request URL, and the docs that come back are mapped to
+# the terms they matched by the values of a few of their attributes.
+import re
+from urllib.parse import quote_plus
+
+from .rpsl import RpslObject
+
+# maximum length of the URL encoded q parameter of a batched query, leaves
+# room for the other parameters below the common 2k URL limits
+MAX_QUERY_LENGTH = 1500
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+class TermBatch(tuple):
+    """Terms that are dispatched and searched for as one item."""
+
+
+def batch_members(item):
+    """Return the terms of a dispatched item, a TermBatch or a single term."""
+    if isinstance(item, TermBatch):
+        return tuple(item)
+    return (item,)
+
+
+def fulltext_query(terms, object_type, attribute=None):
+    """Build the q parameter that finds objects of 'object_type' matching any
+    of 'terms', optionally only in 'attribute'. Every term keeps its own
+    parentheses, so a single term gives the query the modules always sent.
+    """
+    if len(terms) == 1:
+        match = '(' + terms[0] + ')'
+    else:
+        match = '(' + ' OR '.join('(' + term + ')' for term in terms) + ')'
+    if attribute:
+        match = '(' + attribute + ':' + match + ')'
+    return match + ' AND (object-type:' + object_type + ')'
+
+
+def _isolated(term):
+    # terms that would break the syntax of the combined query
+    return term.count('(') != term.count(')') or term.count('"') % 2 == 1
+
+
+def plan_batches(terms, query, size, max_length=MAX_QUERY_LENGTH):
+    """Group the iterable 'terms' into TermBatches of at most 'size' terms
+    whose query(batch) stays within 'max_length' URL encoded characters.
+
+    Empty terms are dropped, a term that is too long or unbalanced on its
+    own becomes a batch of one.
+    """
+    batch = []
+    for term in terms:
+        term = str(term).strip()
+        if not term:
+            continue
+        if _isolated(term):
+            yield TermBatch((term,))
+            continue
+        if batch and len(quote_plus(query(batch + [term]))) > max_length:
+            yield TermBatch(batch)
+            batch = []
+        batch.append(term)
+        if len(batch) >= size:
+            yield TermBatch(batch)
+            batch = []
+    if batch:
+        yield TermBatch(batch)
+
+
+def doc_attributes(doc):
+    """Return the (name, value) pairs of a full-text doc."""
+    try:
+        return [(attribute['str']['name'], attribute['str']['value']) for attribute in doc['doc']['strs']]
+    except (KeyError, TypeError):
+        return []
+
+
+def doc_values(doc, names):
+    """Return the values of the attributes 'names' of a full-text doc."""
+    return [value for name, value in doc_attributes(doc) if name in names]
+
+
+def doc_object(doc):
+    """Build an RpslObject from the attributes of a full-text doc."""
+    attributes = doc_attributes(doc)
+    values = dict(attributes)
+    return RpslObject(values.get('object-type', ''), attributes, key=values.get('lookup-key'))
+
+
+def match_terms(terms, values):
+    """Return the terms a doc with the attribute 'values' was found for.
+
+    A term matches if it is contained in one of the values or all of its
+    words occur in them, both ignoring case.
+    """
+    text = '\n'.join(values).lower()
+    words = None
+    matched = []
+    for term in terms:
+        needle = term.lower()
+        if needle in text:
+            matched.append(term)
+            continue
+        if words is None:
+            words = set(_WORD.findall(text))
+        term_words = _WORD.findall(needle)
+        if term_words and all(word in words for word in term_words):
+            matched.append(term)
+    return matched
+
+
+def count_match(terms, found, doc, fields, key='', debug=None):
+    """Credit a doc of a batched search to the terms it matched.
+
+    'found' maps every term to its number of docs, the doc's 'fields'
+    decide which terms it matched; a single term gets every doc. 'debug'
+    is called with a message per match. Returns the matched terms.
+    """
+    matched = match_terms(terms, doc_values(doc, fields)) if len(terms) > 1 else terms
+    if debug is not None and not matched:
+        debug("%s matched none of %s" % (key, ", ".join(terms)))
+    for term in matched:
+        found[term] += 1
+        if debug is not None:
+            debug("%s found for %s" % (key, term))
+    return matched
@@ -0,0 +1,128 @@
+# In-memory interval index of already resolved inetnum/inet6num ranges.
+# Before a module asks RIPE for an address it checks whether a range that
+# covers the address has already been resolved, in this or an earlier run.
+import bisect
+import json
+import os
+import threading
+
+from .net import address_key, parse_range
+from .rpsl import RpslObject
+
+INDEX_FILENAME = 'ripe_inetnums.json'
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+class IntervalIndex(object):
+    """Thread-safe index of (start, end) integer ranges per IP version.
+
+    Ranges are kept sorted by (start, -end), so for nested ranges the parent
+    precedes its children. Every entry links to the innermost range that
+    contains it; as inetnums nest and never partially overlap, the ranges
+    covering an address are the last entry starting at or before it and
+    that entry's parents, so a lookup only walks the nesting depth.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = {4: [], 6: []}
+        self._entries = {4: [], 6: []}
+        self._dirty = False
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(entries) for entries in self._entries.values())
+
+    @staticmethod
+    def _enclosing(entries, index, start, end):
+        # innermost of entries[index] and its parents that contains start..end
+        entry = entries[index] if index >= 0 else None
+        while entry is not None and not (entry[0] <= start and entry[1] >= end):
+            entry = entry[3]
+        return entry
+
+    def add(self, version, start, end, value):
+        key = (start, -end)
+        with self._lock:
+            keys = self._keys[version]
+            entries = self._entries[version]
+            position = bisect.bisect_left(keys, key)
+            if position < len(keys) and keys[position] == key:
+                entries[position][2] = value
+            else:
+                # entries are [start, end, value, parent entry]
+                parent = self._enclosing(entries, position - 1, start, end)
+                entry = [start, end, value, parent]
+                keys.insert(position, key)
+                entries.insert(position, entry)
+                # the ranges inside the new one that hung from its parent
+                # now hang from it
+                for index in range(position + 1, len(entries)):
+                    child = entries[index]
+                    if child[0] > end:
+                        break
+                    if child[3] is parent:
+                        child[3] = entry
+            self._dirty = True
+
+    def find(self, version, address):
+        """Return the value of the most specific range covering 'address'."""
+        with self._lock:
+            position = bisect.bisect_right(self._keys[version], (address, float('inf')))
+            entry = self._enclosing(self._entries[version], position - 1, address, address)
+        return entry[2] if entry is not None else None
+
+    def add_object(self, ripe_object):
+        """Index an inetnum/inet6num RpslObject under its own range."""
+        bounds = parse_range(ripe_object.key)
+        if bounds is None:
+            return False
+        version, start, end = bounds
+        self.add(version, start, end, ripe_object)
+        return True
+
+    def lookup(self, address):
+        """Return the cached RpslObject covering an address string, or None."""
+        key = address_key(address)
+        if key is None:
+            return None
+        return self.find(*key)
+
+    def load(self, path):
+        if not os.path.exists(path):
+            return
+        with open(path) as infile:
+            for data in json.load(infile):
+                self.add_object(RpslObject.from_dict(data))
+        self._dirty = False
+
+    def save(self, path):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = [entry[2].to_dict() for version in (4, 6) for entry in self._entries[version]]
+            self._dirty = False
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as outfile:
+            json.dump(data, outfile)
+        os.replace(tmp_path, path)
+
+
+def get_index(workspace):
+    """Return the index shared by all modules working on 'workspace'."""
+    with _indexes_lock:
+        index = _indexes.get(workspace)
+        if index is None:
+            index = IntervalIndex()
+            index.load(os.path.join(workspace, INDEX_FILENAME))
+            _indexes[workspace] = index
+        return index
+
+
+def save_index(workspace):
+    with _indexes_lock:
+        index = _indexes.get(workspace)
+    if index is not None:
+        index.save(os.path.join(workspace, INDEX_FILENAME))
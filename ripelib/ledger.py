@@ -0,0 +1,83 @@
+# Per-module progress ledger kept in the workspace.
+# Every input a module has processed is recorded with its outcome and time,
+# so incremental runs only process new, failed or stale inputs and an
+# interrupted run resumes after the last checkpoint.
+import os
+import sqlite3
+import threading
+import time
+
+LEDGER_FILENAME = 'ripe_progress.db'
+
+# results are buffered and committed as one checkpoint every CHECKPOINT_ROWS
+# inputs or CHECKPOINT_INTERVAL seconds
+CHECKPOINT_ROWS = 200
+CHECKPOINT_INTERVAL = 5.0
+
+_ledgers = {}
+_ledgers_lock = threading.Lock()
+
+
+class ProgressLedger(object):
+    """SQLite table of (module, item) -> status, outcome, updated."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = []
+        self._checkpoint = time.monotonic()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS progress (
+            module TEXT, item TEXT, status TEXT, outcome TEXT, updated REAL,
+            PRIMARY KEY (module, item))''')
+
+    def completed(self, module, max_age=None):
+        """Return the set of items 'module' finished successfully, within the
+        last 'max_age' seconds if given."""
+        query = "SELECT item FROM progress WHERE module=? AND status='done'"
+        args = [module]
+        if max_age:
+            query += ' AND updated>=?'
+            args.append(time.time() - max_age)
+        with self._lock:
+            return set(row[0] for row in self._conn.execute(query, args))
+
+    def record(self, module, item, status, outcome=''):
+        """Buffer the result for an item. Returns True if a checkpoint is due."""
+        with self._lock:
+            self._pending.append((module, str(item), status, outcome, time.time()))
+            return len(self._pending) >= CHECKPOINT_ROWS or time.monotonic() - self._checkpoint >= CHECKPOINT_INTERVAL
+
+    def checkpoint(self, before=None):
+        """Commit the buffered results.
+
+        'before' is called ahead of the commit, so the results of the items
+        (rows still queued for the database) can be made durable first and
+        no item is marked as done whose results could be lost.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._checkpoint = time.monotonic()
+        if not pending:
+            return
+        if before is not None:
+            before()
+        with self._lock, self._conn:
+            self._conn.execute('BEGIN')
+            self._conn.executemany('INSERT OR REPLACE INTO progress (module, item, status, outcome, updated) VALUES (?,?,?,?,?)', pending)
+
+    def summary(self, module):
+        """Return {status: count} for 'module'."""
+        with self._lock:
+            return dict(self._conn.execute('SELECT status, COUNT(*) FROM progress WHERE module=? GROUP BY status', (module,)))
+
+
+def get_ledger(workspace):
+    """Return the ledger shared by all modules working on 'workspace'."""
+    with _ledgers_lock:
+        ledger = _ledgers.get(workspace)
+        if ledger is None:
+            ledger = _ledgers[workspace] = ProgressLedger(os.path.join(workspace, LEDGER_FILENAME))
+        return ledger
@@ -0,0 +1,220 @@
+# Read-only, memory-mapped longest-prefix-match database of resolved
+# netblocks, in the spirit of MMDB files.
+# Nested netblocks are flattened into disjoint, sorted address ranges that
+# point at the record of the most specific netblock. A lookup is a binary
+# search directly on the mapped arrays, so opening the file costs nothing
+# and every process using it shares the same pages of the page cache.
+#
+# Layout (native byte order, recorded in the header):
+#   header    magic, byte order, range counts and section offsets
+#   ranges    per IP version: start and end arrays (uint32 for IPv4, two
+#             uint64 words per address for IPv6) and a uint32 record array
+#   records   FIELDS string offsets (uint32) per record
+#   strings   uint16 length + UTF-8 bytes per string, offset 0 is ''
+import bisect
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+
+from .net import address_key, parse_range
+
+LPM_FILENAME = 'ripe_netblocks.lpm'
+MAGIC = b'RIPELPM\x01'
+FIELDS = ('netblock', 'netname', 'country', 'admin-c')
+
+# magic, little endian flag, counts (v4 ranges, v6 ranges, records) and the
+# offsets of starts4, ends4, records4, starts6, ends6, records6, records, strings
+HEADER = struct.Struct('=8sB3xIII8Q')
+LENGTH = struct.Struct('=H')
+
+_MASK64 = (1 << 64) - 1
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def flatten_ranges(ranges):
+    """Turn (start, end, record) ranges that are disjoint or nested into
+    sorted, disjoint (start, end, record) ranges of the innermost record."""
+    flat = []
+
+    def emit(start, end, record):
+        if start > end:
+            return
+        if flat and flat[-1][1] + 1 == start and flat[-1][2] == record:
+            flat[-1] = (flat[-1][0], end, record)
+        else:
+            flat.append((start, end, record))
+
+    stack = []
+    position = 0
+    for start, end, record in sorted(ranges, key=lambda r: (r[0], -r[1])):
+        while stack and stack[-1][0] < start:
+            emit(position, stack[-1][0], stack[-1][1])
+            position = stack.pop()[0] + 1
+        if stack:
+            emit(position, start - 1, stack[-1][1])
+        stack.append((end, record))
+        position = start
+    while stack:
+        emit(position, stack[-1][0], stack[-1][1])
+        position = stack.pop()[0] + 1
+    return flat
+
+
+def write_lpm(path, rows):
+    """Write rows of (netblock, netname, country, admin-c) strings to 'path'.
+
+    Rows with an unparsable netblock are skipped; returns the number of
+    records written. The file is replaced atomically.
+    """
+    strings = {'': 0}
+    string_data = bytearray(LENGTH.pack(0))
+    records = array('I')
+    ranges = {4: [], 6: []}
+    for row in rows:
+        bounds = parse_range(row[0])
+        if bounds is None:
+            continue
+        for value in row:
+            value = value or ''
+            offset = strings.get(value)
+            if offset is None:
+                encoded = value.encode('utf-8')[:0xffff]
+                offset = strings[value] = len(string_data)
+                string_data += LENGTH.pack(len(encoded)) + encoded
+            records.append(offset)
+        version, start, end = bounds
+        ranges[version].append((start, end, len(records) // len(FIELDS) - 1))
+
+    sections = []
+    for version in (4, 6):
+        starts, ends = array('I' if version == 4 else 'Q'), array('I' if version == 4 else 'Q')
+        targets = array('I')
+        for start, end, record in flatten_ranges(ranges[version]):
+            if version == 4:
+                starts.append(start)
+                ends.append(end)
+            else:
+                starts.extend((start >> 64, start & _MASK64))
+                ends.extend((end >> 64, end & _MASK64))
+            targets.append(record)
+        sections += [starts, ends, targets]
+    sections += [records, string_data]
+
+    offsets = []
+    position = HEADER.size
+    for section in sections:
+        offsets.append(position)
+        position += len(section) * getattr(section, 'itemsize', 1)
+        position += -position % 8
+    header = HEADER.pack(MAGIC, sys.byteorder == 'little', len(sections[2]), len(sections[5]),
+                         len(records) // len(FIELDS), *offsets)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as outfile:
+        outfile.write(header)
+        for offset, section in zip(offsets, sections):
+            outfile.write(b'\0' * (offset - outfile.tell()))
+            outfile.write(section if isinstance(section, bytearray) else section.tobytes())
+    os.replace(tmp_path, path)
+    return len(records) // len(FIELDS)
+
+
+class LpmDatabase(object):
+    """Memory-mapped view of a file written by write_lpm."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as infile:
+            self._map = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+            self.mtime = os.fstat(infile.fileno()).st_mtime
+        magic, little, count4, count6, self.records, *offsets = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError('%s is not a netblock database' % path)
+        if bool(little) != (sys.byteorder == 'little'):
+            self._map.close()
+            raise ValueError('%s was written on a machine with another byte order' % path)
+        view = self._view = memoryview(self._map)
+
+        def section(index, count, code):
+            size = array(code).itemsize
+            return view[offsets[index]:offsets[index] + count * size].cast(code)
+
+        self._starts4 = section(0, count4, 'I')
+        self._ends4 = section(1, count4, 'I')
+        self._records4 = section(2, count4, 'I')
+        self._starts6 = section(3, 2 * count6, 'Q')
+        self._ends6 = section(4, 2 * count6, 'Q')
+        self._records6 = section(5, count6, 'I')
+        self._fields = section(6, self.records * len(FIELDS), 'I')
+        self._strings = offsets[7]
+
+    def __len__(self):
+        return self.records
+
+    def _find6(self, address):
+        starts = self._starts6
+        high, low = address >> 64, address & _MASK64
+        lo, hi = 0, len(starts) // 2
+        while lo < hi:
+            middle = (lo + hi) // 2
+            if (starts[2 * middle], starts[2 * middle + 1]) <= (high, low):
+                lo = middle + 1
+            else:
+                hi = middle
+        index = lo - 1
+        if index >= 0 and (self._ends6[2 * index], self._ends6[2 * index + 1]) >= (high, low):
+            return self._records6[index]
+        return -1
+
+    def find(self, version, address):
+        """Return the record number of the most specific netblock containing
+        the integer 'address', or -1."""
+        if version == 6:
+            return self._find6(address)
+        index = bisect.bisect_right(self._starts4, address) - 1
+        if index >= 0 and self._ends4[index] >= address:
+            return self._records4[index]
+        return -1
+
+    def string(self, offset):
+        position = self._strings + offset
+        length = LENGTH.unpack_from(self._map, position)[0]
+        return self._map[position + 2:position + 2 + length].decode('utf-8')
+
+    def record(self, number):
+        """Return the FIELDS of a record as a tuple of strings."""
+        base = number * len(FIELDS)
+        return tuple(self.string(self._fields[base + field]) for field in range(len(FIELDS)))
+
+    def lookup(self, address):
+        """Return (netblock, netname, country, admin-c) for an address string,
+        or None if no netblock contains it."""
+        key = address_key(address)
+        if key is None:
+            return None
+        number = self.find(*key)
+        return self.record(number) if number >= 0 else None
+
+    def close(self):
+        for name in ('_starts4', '_ends4', '_records4', '_starts6', '_ends6', '_records6', '_fields', '_view'):
+            getattr(self, name).release()
+        self._map.close()
+
+
+def open_lpm(path):
+    """Return the database shared by all modules using 'path', or None if the
+    file does not exist."""
+    with _databases_lock:
+        if not os.path.exists(path):
+            return None
+        database = _databases.get(path)
+        # a newer export replaces the file, open the new one
+        if database is None or database.mtime != os.path.getmtime(path):
+            database = _databases[path] = LpmDatabase(path)
+        return database
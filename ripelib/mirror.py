@@ -0,0 +1,277 @@
+# Local mirror of the RIPE database built from the public split dumps
+# (ripe.db.inetnum.gz, ripe.db.person.gz, ...).
+# Objects are stream-parsed and written in batches, so loading needs constant
+# memory; gzip decoding runs in its own thread ahead of the parser.
+import gzip
+import ipaddress
+import json
+import os
+import queue
+import sqlite3
+import threading
+
+from .net import RANGE_TYPES, parse_range
+from .rpsl import RpslObject, iter_rpsl, parse_parallel
+
+MIRROR_FILENAME = 'ripe_mirror.db'
+DUMP_FILES = ('ripe.db.inetnum.gz', 'ripe.db.inet6num.gz', 'ripe.db.person.gz',
+              'ripe.db.role.gz', 'ripe.db.organisation.gz')
+# attributes that reference other objects, kept for inverse lookups
+REFERENCE_ATTRIBUTES = ('admin-c', 'tech-c', 'mnt-by', 'org')
+
+BATCH_SIZE = 10000
+CHUNK_SIZE = 1 << 20
+
+_mirrors = {}
+_mirrors_lock = threading.Lock()
+
+
+def pack_address(value):
+    # 16 byte big-endian blobs sort like the integers for IPv4 and IPv6
+    return value.to_bytes(16, 'big')
+
+
+def pipelined_blocks(path, chunk_size=CHUNK_SIZE, depth=8):
+    """Yield raw blocks of a (gzipped) dump, decompressed in a reader thread."""
+    blocks = queue.Queue(maxsize=depth)
+    opener = gzip.open if path.endswith('.gz') else open
+
+    def reader():
+        try:
+            with opener(path, 'rb') as infile:
+                while True:
+                    block = infile.read(chunk_size)
+                    if not block:
+                        break
+                    blocks.put(block)
+        finally:
+            blocks.put(None)
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    while True:
+        block = blocks.get()
+        if block is None:
+            break
+        yield block
+    thread.join()
+
+
+def pipelined_lines(path):
+    """Yield the text lines of a (gzipped) dump, see pipelined_blocks."""
+    rest = b''
+    for block in pipelined_blocks(path):
+        lines = (rest + block).split(b'\n')
+        rest = lines.pop()
+        for line in lines:
+            yield line.decode('utf-8', 'replace')
+    if rest:
+        yield rest.decode('utf-8', 'replace')
+
+
+class MirrorStore(object):
+    """SQLite store of RPSL objects with range and handle indexes."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS objects (id INTEGER PRIMARY KEY, type TEXT, lookup TEXT, data TEXT);
+            CREATE TABLE IF NOT EXISTS ranges (object_id INTEGER, version INTEGER, start BLOB, end BLOB, parent INTEGER);
+            CREATE TABLE IF NOT EXISTS refs (object_id INTEGER, name TEXT, value TEXT);
+        ''')
+        self.create_indexes()
+        if 'parent' not in [row[1] for row in conn.execute('PRAGMA table_info(ranges)')]:
+            # mirror loaded before ranges were linked to their parents
+            with conn:
+                conn.execute('ALTER TABLE ranges ADD COLUMN parent INTEGER')
+            self.link_ranges()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path)
+            conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def create_indexes(self):
+        self._connection().executescript('''
+            CREATE INDEX IF NOT EXISTS objects_lookup ON objects (lookup, type);
+            CREATE INDEX IF NOT EXISTS ranges_start ON ranges (version, start DESC, end ASC);
+            CREATE INDEX IF NOT EXISTS ranges_object ON ranges (object_id);
+            CREATE INDEX IF NOT EXISTS refs_value ON refs (value, name);
+        ''')
+
+    def drop_indexes(self):
+        self._connection().executescript('''
+            DROP INDEX IF EXISTS objects_lookup;
+            DROP INDEX IF EXISTS ranges_start;
+            DROP INDEX IF EXISTS ranges_object;
+            DROP INDEX IF EXISTS refs_value;
+        ''')
+
+    def clear(self, object_type):
+        conn = self._connection()
+        with conn:
+            conn.execute('DELETE FROM ranges WHERE object_id IN (SELECT id FROM objects WHERE type=?)', (object_type,))
+            conn.execute('DELETE FROM refs WHERE object_id IN (SELECT id FROM objects WHERE type=?)', (object_type,))
+            conn.execute('DELETE FROM objects WHERE type=?', (object_type,))
+
+    def load(self, objects, batch_size=BATCH_SIZE):
+        """Insert an iterable of RpslObject in batches, return the count."""
+        conn = self._connection()
+        next_id = (conn.execute('SELECT MAX(id) FROM objects').fetchone()[0] or 0) + 1
+        count = 0
+        rows, ranges, refs = [], [], []
+        for ripe_object in objects:
+            object_id = next_id + count
+            count += 1
+            rows.append((object_id, ripe_object.type, ripe_object.key.upper(), json.dumps(ripe_object.attributes)))
+            if ripe_object.type in RANGE_TYPES:
+                bounds = parse_range(ripe_object.key)
+                if bounds is not None:
+                    ranges.append((object_id, bounds[0], pack_address(bounds[1]), pack_address(bounds[2])))
+            for name in REFERENCE_ATTRIBUTES:
+                for value in ripe_object.getall(name):
+                    refs.append((object_id, name, value.upper()))
+            if len(rows) >= batch_size:
+                self._flush(conn, rows, ranges, refs)
+                rows, ranges, refs = [], [], []
+        self._flush(conn, rows, ranges, refs)
+        return count
+
+    @staticmethod
+    def _flush(conn, rows, ranges, refs):
+        with conn:
+            conn.executemany('INSERT INTO objects VALUES (?,?,?,?)', rows)
+            conn.executemany('INSERT INTO ranges (object_id, version, start, end) VALUES (?,?,?,?)', ranges)
+            conn.executemany('INSERT INTO refs VALUES (?,?,?)', refs)
+
+    def load_dump(self, path, processes=1):
+        """Replace the objects of the dump's type with the content of 'path'.
+
+        With more than one process the dump is parsed by parse_parallel.
+        """
+        object_type = os.path.basename(path).split('.')[2]
+        self.clear(object_type)
+        self.drop_indexes()
+        if processes > 1:
+            objects = parse_parallel(pipelined_blocks(path), processes, source='ripe')
+        else:
+            objects = iter_rpsl(pipelined_lines(path), source='ripe')
+        try:
+            count = self.load(objects)
+        finally:
+            self.create_indexes()
+        if object_type in RANGE_TYPES:
+            self.link_ranges()
+        return count
+
+    def link_ranges(self):
+        """Set the parent of every range to the innermost range containing it.
+
+        The ranges of a version are read sorted by (start, -end), so a parent
+        comes before its children and the ranges still open form a stack.
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute('CREATE TEMP TABLE IF NOT EXISTS links (object_id INTEGER PRIMARY KEY, parent INTEGER)')
+            conn.execute('DELETE FROM temp.links')
+            for version in (4, 6):
+                stack, links = [], []
+                for object_id, start, end in conn.execute(
+                        'SELECT object_id, start, end FROM ranges WHERE version=? ORDER BY start ASC, end DESC', (version,)):
+                    # a range ending before this one contains neither it nor any range after it
+                    while stack and stack[-1][1] < end:
+                        stack.pop()
+                    if stack:
+                        links.append((object_id, stack[-1][0]))
+                    stack.append((object_id, end))
+                    if len(links) >= BATCH_SIZE:
+                        conn.executemany('INSERT OR REPLACE INTO temp.links VALUES (?,?)', links)
+                        links = []
+                conn.executemany('INSERT OR REPLACE INTO temp.links VALUES (?,?)', links)
+            conn.execute('UPDATE ranges SET parent=(SELECT parent FROM temp.links WHERE links.object_id = ranges.object_id)')
+            conn.execute('DELETE FROM temp.links')
+
+    def _object(self, row):
+        if row is None:
+            return None
+        object_type, data = row
+        return RpslObject(object_type, [tuple(pair) for pair in json.loads(data)], source='ripe')
+
+    def get(self, object_type, key):
+        row = self._connection().execute('SELECT type, data FROM objects WHERE lookup=? AND type=? LIMIT 1',
+                                         (key.strip().upper(), object_type)).fetchone()
+        return self._object(row)
+
+    def find_range(self, version, start, end):
+        """Most specific inetnum/inet6num covering start..end.
+
+        As inetnums nest and never partially overlap, the ranges covering
+        'start' are the last range starting at or before it and that range's
+        parents; the walk up stops at the first one that reaches 'end'.
+        """
+        conn = self._connection()
+        start, end = pack_address(start), pack_address(end)
+        row = conn.execute('SELECT object_id, end, parent FROM ranges WHERE version=? AND start<=? '
+                           'ORDER BY start DESC, end ASC LIMIT 1', (version, start)).fetchone()
+        while row is not None and row[1] < end:
+            if row[2] is None:
+                return None
+            row = conn.execute('SELECT object_id, end, parent FROM ranges WHERE object_id=?', (row[2],)).fetchone()
+        if row is None:
+            return None
+        return self._object(conn.execute('SELECT type, data FROM objects WHERE id=?', (row[0],)).fetchone())
+
+    def inverse(self, name, value, object_type=None):
+        """Objects whose attribute 'name' references 'value'."""
+        query = 'SELECT objects.type, objects.data FROM refs JOIN objects ON objects.id = refs.object_id WHERE refs.value=? AND refs.name=?'
+        args = [value.strip().upper(), name]
+        if object_type:
+            query += ' AND objects.type=?'
+            args.append(object_type)
+        return [self._object(row) for row in self._connection().execute(query, args)]
+
+    def search(self, query, object_type, referenced=False):
+        """Answer a query-string/type-filter lookup like the REST search.
+
+        Returns a list of RpslObject, the match first, followed by the
+        referenced person/role objects if 'referenced' is set.
+        """
+        if object_type in RANGE_TYPES:
+            bounds = parse_range(query)
+            if bounds is None:
+                try:
+                    address = ipaddress.ip_address(query.strip())
+                except ValueError:
+                    return []
+                bounds = (address.version, int(address), int(address))
+            result = self.find_range(*bounds)
+            if result is not None and result.type != object_type:
+                result = None
+        else:
+            result = self.get(object_type, query)
+        if result is None:
+            return []
+        objects = [result]
+        if referenced:
+            seen = set()
+            for handle in result.getall('admin-c') + result.getall('tech-c'):
+                if handle in seen:
+                    continue
+                seen.add(handle)
+                contact = self.get('person', handle) or self.get('role', handle)
+                if contact is not None:
+                    objects.append(contact)
+        return objects
+
+
+def get_mirror(path):
+    """Return the mirror store shared by all modules using 'path'."""
+    with _mirrors_lock:
+        mirror = _mirrors.get(path)
+        if mirror is None:
+            mirror = _mirrors[path] = MirrorStore(path)
+        return mirror
@@ -0,0 +1,106 @@
+# Address helpers shared by the RIPE modules.
+# IPv4 values are converted with plain integer arithmetic, which is much
+# cheaper than building ipaddress objects when thousands of inetnums are
+# converted at once; IPv6 goes through the ipaddress module.
+import ipaddress
+
+# RPSL object types that describe an address range, per IP version
+RANGE_TYPES = ('inetnum', 'inet6num')
+
+
+def _ipv4_to_int(text):
+    parts = text.split('.')
+    if len(parts) != 4:
+        raise ValueError(text)
+    value = 0
+    for part in parts:
+        octet = int(part)
+        if not 0 <= octet <= 255 or not part.strip().isdigit():
+            raise ValueError(text)
+        value = value << 8 | octet
+    return value
+
+
+def _ipv4_to_str(value):
+    return '%d.%d.%d.%d' % (value >> 24, value >> 16 & 255, value >> 8 & 255, value & 255)
+
+
+def parse_range(text):
+    """Turn an inetnum ("a.b.c.d - e.f.g.h") or inet6num ("x::/n") value into
+    a (version, start, end) tuple of integers. Returns None if unparsable.
+    """
+    text = text.strip()
+    try:
+        if '/' in text:
+            address, prefix = text.split('/', 1)
+            if ':' not in address and prefix.isdigit() and int(prefix) <= 32:
+                hostmask = (1 << 32 - int(prefix)) - 1
+                start = _ipv4_to_int(address.strip()) & ~hostmask
+                return (4, start, start | hostmask)
+            network = ipaddress.ip_network(text, strict=False)
+            return (network.version, int(network.network_address), int(network.broadcast_address))
+        first, last = text.split('-', 1)
+        if ':' in text:
+            start = ipaddress.IPv6Address(first.strip())
+            end = ipaddress.IPv6Address(last.strip())
+            version, start, end = 6, int(start), int(end)
+        else:
+            version, start, end = 4, _ipv4_to_int(first.strip()), _ipv4_to_int(last.strip())
+    except ValueError:
+        return None
+    if start > end:
+        return None
+    return (version, start, end)
+
+
+def address_key(address):
+    """Return (version, integer) for an IP address string, or None."""
+    address = address.strip()
+    try:
+        if ':' not in address:
+            return (4, _ipv4_to_int(address))
+        ip = ipaddress.IPv6Address(address)
+    except ValueError:
+        return None
+    return (6, int(ip))
+
+
+def range_type(text):
+    """Return the object type (inetnum or inet6num) to query for an address,
+    range or CIDR string."""
+    return RANGE_TYPES[1] if ':' in text else RANGE_TYPES[0]
+
+
+def range_to_cidrs(version, start, end):
+    """Split the integer range start..end into its minimal list of CIDR strings."""
+    bits = 32 if version == 4 else 128
+    cidrs = []
+    while start <= end:
+        # the largest aligned block at 'start' that does not run past 'end'
+        size = min(start & -start if start else 1 << bits, 1 << (end - start + 1).bit_length() - 1)
+        if version == 4:
+            address = _ipv4_to_str(start)
+        else:
+            address = str(ipaddress.IPv6Address(start))
+        cidrs.append('%s/%d' % (address, bits + 1 - size.bit_length()))
+        start += size
+    return cidrs
+
+
+def inetnum_to_cidrs(text):
+    """Return all CIDRs of an inetnum/inet6num value, [] if unparsable."""
+    bounds = parse_range(text)
+    if bounds is None:
+        return []
+    return range_to_cidrs(*bounds)
+
+
+def inetnums_to_cidrs(texts):
+    """Batch version of inetnum_to_cidrs, one list of CIDRs per input value."""
+    parse = parse_range
+    split = range_to_cidrs
+    results = []
+    for text in texts:
+        bounds = parse(text)
+        results.append(split(*bounds) if bounds is not None else [])
+    return results
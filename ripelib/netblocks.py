@@ -0,0 +1,82 @@
+# Structured columns of the recon-ng netblocks table.
+# Besides the CIDR text every netblock row carries its address range as
+# start_int/end_int and the main attributes of the inetnum it came from, so
+# containment and overlap questions are answered by indexed SQL:
+#
+#   SELECT netblock FROM netblocks WHERE start_int <= :address AND end_int >= :address
+#
+# IPv4 bounds are stored as INTEGER, IPv6 bounds as 16 byte big-endian BLOB.
+# SQLite orders every INTEGER before every BLOB, so both kinds share the
+# columns and one index without matching across IP versions.
+from .net import parse_range
+
+NETBLOCK_COLUMNS = (
+    ('start_int', 'BLOB'),
+    ('end_int', 'BLOB'),
+    ('netname', 'TEXT'),
+    ('country', 'TEXT'),
+    ('admin_c', 'TEXT'),
+    ('tech_c', 'TEXT'),
+    ('last_modified', 'TEXT'),
+)
+NETBLOCK_INDEXES = (
+    ('netblocks_range', 'start_int, end_int'),
+    ('netblocks_netname', 'netname'),
+    ('netblocks_admin_c', 'admin_c'),
+)
+
+
+def address_value(version, value):
+    """Return the start_int/end_int representation of an integer address."""
+    return value if version == 4 else value.to_bytes(16, 'big')
+
+
+def ensure_netblock_columns(query):
+    """Add the missing columns and indexes to the netblocks table.
+
+    'query' runs one SQL statement, like BaseModule.query or
+    sqlite3.Connection.execute(...).fetchall.
+    """
+    existing = set(row[1] for row in query('PRAGMA table_info(netblocks)'))
+    for column, column_type in NETBLOCK_COLUMNS:
+        if column not in existing:
+            query('ALTER TABLE netblocks ADD COLUMN %s %s' % (column, column_type))
+    for name, columns in NETBLOCK_INDEXES:
+        query('CREATE INDEX IF NOT EXISTS %s ON netblocks (%s)' % (name, columns))
+
+
+def covering_object(index, netblock):
+    """Return the inetnum/inet6num of an IntervalIndex that contains the
+    whole netblock, or None."""
+    bounds = parse_range(netblock)
+    if bounds is None:
+        return None
+    version, start, end = bounds
+    ripe_object = index.find(version, start)
+    covering = parse_range(ripe_object.key) if ripe_object is not None else None
+    if covering is None or covering[2] < end:
+        return None
+    return ripe_object
+
+
+def netblock_row(netblock, ripe_object=None, **values):
+    """Return the netblocks row for a CIDR string.
+
+    The attributes are read from 'ripe_object' (an inetnum or inet6num
+    RpslObject) when given; keyword arguments (netname, country, admin_c,
+    tech_c, last_modified, notes, ...) are added or take precedence.
+    """
+    row = {'netblock': netblock}
+    bounds = parse_range(netblock)
+    if bounds is not None:
+        version, start, end = bounds
+        row['start_int'] = address_value(version, start)
+        row['end_int'] = address_value(version, end)
+    if ripe_object is not None:
+        row['netname'] = ripe_object.first('netname')
+        row['country'] = ripe_object.first('country')
+        row['admin_c'] = ', '.join(ripe_object.getall('admin-c'))
+        row['tech_c'] = ', '.join(ripe_object.getall('tech-c'))
+        row['last_modified'] = ripe_object.first('last-modified')
+    row.update(values)
+    return row
@@ -0,0 +1,126 @@
+# Bookkeeping of the ripe_pivot module.
+# The pivot walks the RIPE object graph breadth first: companies lead to
+# netblocks, netblocks to their contacts, maintainers and organisations, and
+# those back to the netblocks that reference them. Every node is expanded
+# at most once per run, however many paths lead to it.
+import re
+import threading
+
+from .net import parse_range
+
+# node kinds and the attributes of a netblock that lead to them
+COMPANY = 'company'
+RANGE = 'range'
+HANDLE = 'handle'
+MNTNER = 'mntner'
+ORG = 'org'
+
+LINKS = (('admin-c', HANDLE), ('tech-c', HANDLE), ('mnt-by', MNTNER), ('org', ORG))
+
+# the attributes an inverse query for a node kind searches
+INVERSE_ATTRIBUTES = {
+    HANDLE: ('admin-c', 'tech-c'),
+    MNTNER: ('mnt-by',),
+    ORG: ('org',),
+}
+
+# nic-hdl: two to four letters, up to six digits and the suffix of a
+# registry; hyphenated names like T-Mobile stay company names
+_HANDLE = re.compile(r'^[A-Z]{2,4}[0-9]{0,6}-(?:RIPE|ARIN|AP|AFRINIC|LACNIC|JP|KR|TW|CN)$')
+
+
+def classify(value):
+    """Return the (kind, value) node for a seed value of the SOURCE: org
+    IDs, maintainers (-MNT) and nic-hdls by their form, address ranges if
+    they parse, anything else is searched for as a company name.
+    """
+    value = str(value).strip()
+    upper = value.upper()
+    if upper.startswith('ORG-'):
+        return (ORG, upper)
+    if upper.endswith('-MNT'):
+        return (MNTNER, upper)
+    if _HANDLE.match(upper):
+        return (HANDLE, upper)
+    if parse_range(value) is not None:
+        return (RANGE, value)
+    return (COMPANY, value)
+
+
+def links(ripe_object):
+    """Return the nodes a netblock object references."""
+    nodes = []
+    for name, kind in LINKS:
+        for value in ripe_object.getall(name):
+            nodes.append((kind, value.strip().upper()))
+    return nodes
+
+
+class Frontier(object):
+    """Visited set and next level of the breadth-first walk, shared by the
+    worker threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seen = set()
+        self._next = []
+
+    def add(self, node):
+        """Queue 'node' for the next level unless it was seen before."""
+        with self._lock:
+            if node in self._seen:
+                return False
+            self._seen.add(node)
+            self._next.append(node)
+            return True
+
+    def visit(self, node):
+        """Mark 'node' as seen without queueing it, e.g. a netblock that came
+        complete with a search result. Returns False if it was seen before."""
+        with self._lock:
+            if node in self._seen:
+                return False
+            self._seen.add(node)
+            return True
+
+    def forget(self, node):
+        """Undo visit() for a node whose lookup has to be repeated."""
+        with self._lock:
+            self._seen.discard(node)
+
+    def advance(self):
+        """Return the queued nodes and start a new level."""
+        with self._lock:
+            level, self._next = self._next, []
+            return level
+
+    def __len__(self):
+        with self._lock:
+            return len(self._seen)
+
+
+class Budget(object):
+    """Counts the requests sent upstream against a limit (0 = unlimited)."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def take(self):
+        """Reserve a request. Returns False once the limit is reached."""
+        with self._lock:
+            if self.limit and self.used >= self.limit:
+                return False
+            self.used += 1
+            return True
+
+    def refund(self):
+        """Give back a reservation that was answered from the cache."""
+        with self._lock:
+            self.used -= 1
+
+    @property
+    def exhausted(self):
+        with self._lock:
+            return bool(self.limit) and self.used >= self.limit
@@ -0,0 +1,58 @@
+# Token bucket rate limiter shared by all workers talking to the same host.
+import threading
+import time
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket: 'rate' tokens per second, at most 'burst' saved up."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(float(burst), 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def configure(self, rate, burst=1):
+        with self._lock:
+            self._refill()
+            self.rate = float(rate)
+            self.burst = max(float(burst), 1.0)
+            self._tokens = min(self._tokens, self.burst)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self):
+        """Take a token and return how long the caller has to wait for it."""
+        with self._lock:
+            if self.rate <= 0:
+                return 0.0
+            self._refill()
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        """Block until a token is available. Returns the time waited."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+def get_limiter(host, rate, burst=1):
+    """Return the bucket shared by every module thread requesting 'host'."""
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = _limiters[host] = TokenBucket(rate, burst)
+        elif limiter.rate != rate or limiter.burst != max(float(burst), 1.0):
+            limiter.configure(rate, burst)
+        return limiter
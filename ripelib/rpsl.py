@@ -0,0 +1,163 @@
+# RPSL object model shared by the RIPE modules.
+# A RIPE response is parsed exactly once into RpslObject instances, lookups
+# by attribute name are then served from a dictionary index.
+import collections
+import json
+import multiprocessing
+
+# object types whose primary key is not the attribute named like the type
+PRIMARY_KEYS = {'person': 'nic-hdl', 'role': 'nic-hdl'}
+
+
+class RpslObject(object):
+    """A single RPSL object (inetnum, person, role, ...) as an attribute multimap."""
+
+    __slots__ = ('type', 'key', 'source', 'attributes', '_index')
+
+    def __init__(self, type, attributes, key=None, source=None):
+        self.type = type
+        self.attributes = list(attributes)
+        self.source = source
+        index = {}
+        for name, value in self.attributes:
+            index.setdefault(name, []).append(value)
+        self._index = index
+        if key is None:
+            values = index.get(PRIMARY_KEYS.get(type, type))
+            key = values[0] if values else ''
+        self.key = key
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __repr__(self):
+        return '<RpslObject %s %s>' % (self.type, self.key)
+
+    def getall(self, name):
+        """Return every value of attribute 'name' in object order."""
+        return list(self._index.get(name, ()))
+
+    def first(self, name, default=''):
+        """Return the first value of attribute 'name'."""
+        values = self._index.get(name)
+        return values[0] if values else default
+
+    def value(self, name, sep=''):
+        """Return all values of attribute 'name' joined with 'sep'.
+
+        With the default separator this is what the old json_search helpers
+        returned for repeated attributes.
+        """
+        return sep.join(self._index.get(name, ()))
+
+    def to_dict(self):
+        return {'type': self.type, 'key': self.key, 'source': self.source,
+                'attributes': [[name, value] for name, value in self.attributes]}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['type'], [tuple(pair) for pair in data['attributes']],
+                   key=data.get('key'), source=data.get('source'))
+
+    @classmethod
+    def from_rest(cls, obj):
+        """Build an object from one entry of a REST API 'objects.object' list."""
+        attributes = [(attribute['name'], attribute['value'])
+                      for attribute in obj['attributes']['attribute']]
+        key = None
+        primary_key = obj.get('primary-key', {}).get('attribute')
+        if primary_key:
+            key = ''.join(attribute['value'] for attribute in primary_key)
+        source = obj.get('source', {}).get('id')
+        return cls(obj['type'], attributes, key=key, source=source)
+
+
+def parse_rest_response(text):
+    """Parse a rest.db.ripe.net search.json body into a list of RpslObject.
+
+    Raises ValueError if the body is not a JSON search result.
+    """
+    data = json.loads(text)
+    try:
+        objects = data['objects']['object']
+    except (KeyError, TypeError):
+        raise ValueError('no objects in response')
+    return [RpslObject.from_rest(obj) for obj in objects]
+
+
+def iter_rpsl(lines, source=None):
+    """Yield RpslObject instances from RPSL text lines (e.g. a RIPE dump).
+
+    Objects are separated by blank lines, lines starting with '%' or '#'
+    are comments, '#' also starts a comment at the end of a value, and
+    lines starting with whitespace or '+' continue the previous attribute.
+    Repeated attributes are kept in order.
+    """
+    attributes = []
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            if attributes:
+                yield RpslObject(attributes[0][0], attributes, source=source)
+                attributes = []
+            continue
+        first = line[0]
+        if first in '%#':
+            continue
+        if first in ' \t+':
+            if attributes:
+                value = line[1:].split('#', 1)[0].strip()
+                if value:
+                    name, previous = attributes[-1]
+                    attributes[-1] = (name, previous + ' ' + value if previous else value)
+            continue
+        name, colon, value = line.partition(':')
+        if not colon:
+            continue
+        attributes.append((name.strip().lower(), value.split('#', 1)[0].strip()))
+    if attributes:
+        yield RpslObject(attributes[0][0], attributes, source=source)
+
+
+def align_chunks(blocks):
+    """Re-cut raw byte blocks so that every chunk ends at a blank line.
+
+    No object is split between two chunks, so chunks can be parsed
+    independently of each other.
+    """
+    rest = b''
+    for block in blocks:
+        data = rest + block
+        cut = data.rfind(b'\n\n')
+        if cut < 0:
+            rest = data
+            continue
+        yield data[:cut + 2]
+        rest = data[cut + 2:]
+    if rest:
+        yield rest
+
+
+def _parse_chunk(data):
+    lines = data.decode('utf-8', 'replace').split('\n')
+    return [(ripe_object.type, ripe_object.attributes) for ripe_object in iter_rpsl(lines)]
+
+
+def parse_parallel(blocks, processes=None, source=None):
+    """Like iter_rpsl, but for raw byte blocks of a dump parsed by a pool of processes.
+
+    The blocks are cut at object boundaries with align_chunks. Objects are
+    yielded in input order and at most two chunks per process are in
+    flight, so memory use does not depend on the size of the input.
+    """
+    processes = processes or multiprocessing.cpu_count()
+    with multiprocessing.Pool(processes) as pool:
+        pending = collections.deque()
+        for chunk in align_chunks(blocks):
+            pending.append(pool.apply_async(_parse_chunk, (chunk,)))
+            if len(pending) >= processes * 2:
+                for object_type, attributes in pending.popleft().get():
+                    yield RpslObject(object_type, attributes, source=source)
+        while pending:
+            for object_type, attributes in pending.popleft().get():
+                yield RpslObject(object_type, attributes, source=source)
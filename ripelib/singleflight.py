@@ -0,0 +1,62 @@
+# Coalescing of identical requests that are in flight at the same time.
+# Hundreds of netblocks share one admin-c, so the workers often ask for the
+# same object at the same moment. The response cache only helps the ones
+# that come after the first response was stored; with single-flight the
+# later callers wait for the request already running instead of sending
+# their own.
+import threading
+
+
+class _Call(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """Runs a function once per key for all callers that overlap in time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.shared = 0
+
+    def do(self, key, fn):
+        """Call fn() unless a call for 'key' is running, else wait for it.
+
+        Returns (result, shared); shared is True for the callers that got
+        the result of another caller's call. Exceptions of fn are raised in
+        every caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+_flights = SingleFlight()
+
+
+def get_flights():
+    """Return the single-flight group shared by every module thread."""
+    return _flights
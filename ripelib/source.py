@@ -0,0 +1,95 @@
+# Streaming module input.
+# recon-ng runs the SOURCE query of a module and hands the complete result
+# list to module_run. For big tables that list alone costs hundreds of MB
+# before the first request is sent, so the RIPE modules read their input
+# through a cursor instead, a page of rows at a time.
+import os
+import sqlite3
+
+from recon.core.framework import FrameworkException
+
+PAGE_SIZE = 1000
+
+
+def open_query(path, query, page_size=PAGE_SIZE):
+    """Run 'query' on the database 'path' and fetch its first page.
+
+    Returns the connection, the cursor and the first page, so errors in the
+    query and an empty result show up before the rows are consumed. The
+    connection is closed if the query fails.
+    """
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        cursor = conn.execute(query)
+        return conn, cursor, cursor.fetchmany(page_size)
+    except BaseException:
+        conn.close()
+        raise
+
+
+def iter_rows(conn, cursor, rows, page_size=PAGE_SIZE):
+    """Yield the rows of an open_query result like recon-ng's SOURCE
+    handling does: the value itself for single column rows, the row tuple
+    otherwise. The connection is closed when the rows are exhausted.
+    """
+    try:
+        while rows:
+            for row in rows:
+                yield row[0] if len(row) == 1 else row
+            rows = cursor.fetchmany(page_size)
+    finally:
+        conn.close()
+
+
+def journal_mode(path):
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        return conn.execute('PRAGMA journal_mode').fetchone()[0].lower()
+    finally:
+        conn.close()
+
+
+def enable_wal(path):
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        return conn.execute('PRAGMA journal_mode=WAL').fetchone()[0].lower() == 'wal'
+    finally:
+        conn.close()
+
+
+class StreamingSourceMixin(object):
+    """Hands module_run a generator over the SOURCE query instead of a list.
+
+    Must precede BaseModule in the bases of a module to take over
+    BaseModule._get_source. Only the 'default' and 'query <sql>' sources
+    are streamed; files and literal values are passed on to recon-ng.
+    Like recon-ng, the query runs before module_run is called, and a bad
+    query or an empty result raises a FrameworkException there.
+
+    The input cursor keeps a read transaction open for the whole run,
+    which blocks the writes of the module unless data.db is in WAL mode.
+    The mode is switched once, with a message; if it cannot be switched,
+    the input is read by recon-ng as a list.
+    """
+
+    def _get_source(self, params, query=None):
+        words = params.split(None, 1)
+        prefix = words[0].lower() if words else ''
+        if prefix == 'query' and len(words) > 1:
+            query = words[1]
+        elif prefix != 'default':
+            return super(StreamingSourceMixin, self)._get_source(params, query)
+        path = os.path.join(self.workspace, 'data.db')
+        if journal_mode(path) != 'wal':
+            if not enable_wal(path):
+                self.verbose('Could not switch data.db to WAL mode, reading the complete source.')
+                return super(StreamingSourceMixin, self)._get_source(params, query)
+            self.output('Switched data.db to WAL mode to stream the source while results are written (persistent).')
+        try:
+            conn, cursor, rows = open_query(path, query)
+        except sqlite3.OperationalError as e:
+            raise FrameworkException(f"Invalid source query. {type(e).__name__} {e}")
+        if not rows:
+            conn.close()
+            raise FrameworkException('Source contains no input.')
+        return iter_rows(conn, cursor, rows)
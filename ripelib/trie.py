@@ -0,0 +1,160 @@
+# Path-compressed binary radix (Patricia) trie for longest-prefix matching.
+# Nodes live in parallel typed arrays instead of per-node Python objects, so
+# a trie over millions of prefixes costs a few dozen bytes per node.
+from array import array
+
+from .net import address_key, parse_range
+
+_MASK64 = (1 << 64) - 1
+
+
+class PrefixTrie(object):
+    """Longest-prefix-match table for one IP version.
+
+    Node 0 is the root (the zero-length prefix). Every node stores its
+    prefix left-aligned in a 'bits' wide integer together with the prefix
+    length; children are the indexes of the nodes that continue with a 0
+    or a 1 bit at that length. Values are kept in a list and referenced by
+    index, -1 meaning the node only joins two branches.
+    """
+
+    def __init__(self, version=4):
+        self.version = version
+        self.bits = 32 if version == 4 else 128
+        self._length = array('B', [0])
+        self._zero = array('i', [0])
+        self._one = array('i', [0])
+        self._value = array('i', [-1])
+        # IPv4 prefixes fit into one 32 bit word, IPv6 into two 64 bit words
+        if version == 4:
+            self._low = array('I', [0])
+            self._high = None
+        else:
+            self._low = array('Q', [0])
+            self._high = array('Q', [0])
+        self._values = []
+
+    def __len__(self):
+        return len(self._values)
+
+    def _key(self, node):
+        if self._high is None:
+            return self._low[node]
+        return self._high[node] << 64 | self._low[node]
+
+    def _new_node(self, key, length, value):
+        self._length.append(length)
+        self._zero.append(0)
+        self._one.append(0)
+        self._value.append(value)
+        if self._high is None:
+            self._low.append(key)
+        else:
+            self._low.append(key & _MASK64)
+            self._high.append(key >> 64)
+        return len(self._length) - 1
+
+    def _new_value(self, value):
+        self._values.append(value)
+        return len(self._values) - 1
+
+    def _set_child(self, node, bit, child):
+        if bit:
+            self._one[node] = child
+        else:
+            self._zero[node] = child
+
+    def insert(self, key, length, value):
+        """Store 'value' for the prefix key/length, replacing an equal prefix."""
+        bits = self.bits
+        if not 0 <= length <= bits:
+            raise ValueError('invalid prefix length %d' % length)
+        key &= ((1 << length) - 1) << (bits - length)
+        node = 0
+        while True:
+            node_length = self._length[node]
+            if node_length == length:
+                if self._value[node] < 0:
+                    self._value[node] = self._new_value(value)
+                else:
+                    self._values[self._value[node]] = value
+                return
+            bit = key >> (bits - 1 - node_length) & 1
+            child = self._one[node] if bit else self._zero[node]
+            if not child:
+                self._set_child(node, bit, self._new_node(key, length, self._new_value(value)))
+                return
+            child_key = self._key(child)
+            child_length = self._length[child]
+            common = min(bits - (key ^ child_key).bit_length(), length, child_length)
+            if common == child_length:
+                node = child
+                continue
+            if common == length:
+                # the new prefix sits between node and child
+                middle = self._new_node(key, length, self._new_value(value))
+            else:
+                # node and the new prefix branch off below their common prefix
+                middle = self._new_node(key & ~((1 << (bits - common)) - 1), common, -1)
+                self._set_child(middle, key >> (bits - 1 - common) & 1,
+                                self._new_node(key, length, self._new_value(value)))
+            self._set_child(middle, child_key >> (bits - 1 - common) & 1, child)
+            self._set_child(node, bit, middle)
+            return
+
+    def lookup(self, address):
+        """Return the value of the longest prefix containing the integer
+        'address', or None."""
+        bits = self.bits
+        length = self._length
+        zero = self._zero
+        one = self._one
+        values = self._value
+        low = self._low
+        high = self._high
+        best = values[0]
+        node = 0
+        node_length = 0
+        while node_length < bits:
+            if address >> (bits - 1 - node_length) & 1:
+                node = one[node]
+            else:
+                node = zero[node]
+            if not node:
+                break
+            node_length = length[node]
+            key = low[node] if high is None else high[node] << 64 | low[node]
+            if (address ^ key) >> (bits - node_length):
+                break
+            if values[node] >= 0:
+                best = values[node]
+        return self._values[best] if best >= 0 else None
+
+
+class NetblockTrie(object):
+    """Pair of IPv4 and IPv6 tries keyed by netblock strings."""
+
+    def __init__(self):
+        self.tries = {4: PrefixTrie(4), 6: PrefixTrie(6)}
+
+    def __len__(self):
+        return len(self.tries[4]) + len(self.tries[6])
+
+    def add(self, netblock, value=None):
+        """Insert a CIDR netblock, the value defaults to the netblock itself.
+        Returns False if the netblock is not a valid CIDR."""
+        bounds = parse_range(netblock)
+        if bounds is None or '/' not in netblock:
+            return False
+        version, start, end = bounds
+        trie = self.tries[version]
+        trie.insert(start, trie.bits - (end - start).bit_length(), netblock if value is None else value)
+        return True
+
+    def lookup(self, address):
+        """Return the value of the most specific netblock containing the
+        address string, or None."""
+        key = address_key(address)
+        if key is None:
+            return None
+        return self.tries[key[0]].lookup(key[1])
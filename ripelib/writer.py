@@ -0,0 +1,156 @@
+# Buffered writer for module results.
+# Worker threads only queue rows; a single thread owns the connection to the
+# workspace database and writes the queued rows in one transaction per batch,
+# flushed when 'batch_size' rows are pending or 'interval' seconds passed.
+import queue
+import sqlite3
+import threading
+import time
+
+# the columns recon-ng's insert_<table> helpers treat as the identity of a row
+UNIQUE_COLUMNS = {
+    'companies': ('company',),
+    'contacts': ('first_name', 'middle_name', 'last_name', 'title', 'email'),
+    'hosts': ('host', 'ip_address'),
+    'netblocks': ('netblock',),
+}
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+class BatchWriter(object):
+    """Queue of rows written by one background thread in batches.
+
+    put() never touches the database. flush() commits the pending rows at
+    once and blocks until every row queued before it is written.
+    """
+
+    def __init__(self, path, batch_size=500, interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.inserted = {}
+        self.updated = {}
+        self.errors = []
+        self._counts_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._columns = {}
+        self._thread = threading.Thread(target=self._run, name='batch-writer', daemon=True)
+        self._thread.start()
+
+    def put(self, table, data, update=None):
+        """Queue a row for 'table'.
+
+        None and '' values are dropped like recon-ng's insert() does. Without
+        'update' the row is inserted unless an equal row exists; with a tuple
+        of key columns the other columns of the matching rows are updated
+        and the row is only inserted if there is none. Only rows with a
+        changed value count as updated.
+        """
+        data = dict((column, value) for column, value in data.items() if value is not None and value != '')
+        if data:
+            self._queue.put((table, data, update))
+
+    def flush(self):
+        self._queue.put(None)
+        self._queue.join()
+
+    def counts(self):
+        """Return copies of the committed (inserted, updated) rows per table."""
+        with self._counts_lock:
+            return dict(self.inserted), dict(self.updated)
+
+    def _table_columns(self, connection, table):
+        columns = self._columns.get(table)
+        if columns is None:
+            columns = self._columns[table] = set(row[1] for row in connection.execute('PRAGMA table_info("%s")' % table))
+        return columns
+
+    def _write(self, connection, table, data, update, inserted, updated):
+        columns = self._table_columns(connection, table)
+        data = dict((column, value) for column, value in data.items() if column in columns)
+        if not data:
+            return
+        if update:
+            keys = [column for column in update if column in data]
+            values = [column for column in data if column not in keys and column != 'module']
+            if keys and values:
+                # rows that already hold these values are neither touched nor
+                # counted; the insert below then finds them and does nothing
+                cursor = connection.execute('UPDATE "%s" SET %s WHERE %s AND (%s)' % (
+                    table, ', '.join('"%s"=?' % column for column in values), ' AND '.join('"%s"=?' % column for column in keys),
+                    ' OR '.join('"%s" IS NOT ?' % column for column in values)),
+                    [data[column] for column in values] + [data[column] for column in keys] + [data[column] for column in values])
+                if cursor.rowcount:
+                    updated[table] = updated.get(table, 0) + cursor.rowcount
+                    return
+            unique = keys
+        else:
+            unique = [column for column in UNIQUE_COLUMNS.get(table, data) if column in data and column != 'module']
+        names = list(data)
+        if unique:
+            cursor = connection.execute('INSERT INTO "%s" ("%s") SELECT %s WHERE NOT EXISTS (SELECT 1 FROM "%s" WHERE %s)' % (
+                table, '", "'.join(names), ', '.join('?' * len(names)), table, ' AND '.join('"%s"=?' % column for column in unique)),
+                [data[column] for column in names] + [data[column] for column in unique])
+        else:
+            cursor = connection.execute('INSERT INTO "%s" ("%s") VALUES (%s)' % (table, '", "'.join(names), ', '.join('?' * len(names))),
+                                        [data[column] for column in names])
+        inserted[table] = inserted.get(table, 0) + cursor.rowcount
+
+    def _commit(self, connection, batch):
+        # modules add columns before they run, read the schema again
+        self._columns = {}
+        # rows of a batch only count once it is committed
+        inserted, updated = {}, {}
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            for table, data, update in batch:
+                self._write(connection, table, data, update, inserted, updated)
+            connection.execute('COMMIT')
+            with self._counts_lock:
+                for table, count in inserted.items():
+                    self.inserted[table] = self.inserted.get(table, 0) + count
+                for table, count in updated.items():
+                    self.updated[table] = self.updated.get(table, 0) + count
+        except sqlite3.Error as e:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            self.errors.append('%d rows not written: %s' % (len(batch), e))
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _run(self):
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                # the interval of the oldest pending row is over
+                item = False
+            if item:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.interval
+                if len(batch) < self.batch_size:
+                    continue
+            if batch:
+                self._commit(connection, batch)
+                batch = []
+            deadline = None
+            if item is None:
+                # flush marker
+                self._queue.task_done()
+
+
+def get_writer(path):
+    """Return the writer shared by all modules writing to the database 'path'."""
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            writer = _writers[path] = BatchWriter(path)
+        return writer
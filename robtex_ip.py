@@ -6,9 +6,13 @@ from recon.mixins.threads import ThreadingMixin
 # module specific imports
 import os
 import json
-import time
+import sys
 
-class Module(BaseModule, ResolverMixin, ThreadingMixin):
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from ripelib.client import CachedRequestMixin, RequestFailed
+from ripelib.source import StreamingSourceMixin
+
+class Module(StreamingSourceMixin, BaseModule, ResolverMixin, ThreadingMixin, CachedRequestMixin):
 
     meta = {
         'name': 'Robtex  Resolver',
@@ -18,23 +22,41 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
         'dependencies': [],
         'files': [],
 #        'required_keys': ['robtex_api', 'robtex_secret'],
-        'query': 'SELECT DISTINCT ip_address FROM hosts WHERE ip_address IS NOT NULL'
+        'query': 'SELECT DISTINCT ip_address FROM hosts WHERE ip_address IS NOT NULL',
+        'options': (
+            ('cache', True, False, 'cache responses in ripe_cache.db in the workspace'),
+            ('cache_size', 64, False, 'maximum size of the response cache in MB'),
+            ('rate', 1, False, 'maximum number of requests per second per host (0 = unlimited)'),
+            ('burst', 1, False, 'number of requests allowed at once before the rate applies'),
+            ('retries', 3, False, 'number of times a throttled or timed out item is requeued'),
+            ('incremental', False, False, 'only process inputs not resolved by an earlier run (progress in ripe_progress.db)'),
+            ('max_age', 30, False, 'days after which an input resolved earlier is processed again in incremental runs (0 = never)'),
+            ('lpm', '', False, 'path of the netblock database written by ripe_lpm_export (default: ripe_netblocks.lpm in the workspace, used if it exists)'),
+        ),
     }
 
     def module_run(self, ips):
-        self.thread(ips)
+        self.lpm = self.lpm_database()
+        self.dispatch(ips)
 
     def module_thread(self, ip):
-        time.sleep(1)
         description = ""
-        resp = self.request(url='https://freeapi.robtex.com/ipquery/'+ip,headers={'Accept': 'application/json'}, method='GET')
+        resp = self.cached_request('https://freeapi.robtex.com/ipquery/'+ip, object_type='robtex')
+        if not self.check_response(resp, ip):
+            return
 
 #        self.debug("Got a response: " + resp.text)
         hostnames_list = self.json_search(resp.text,"o")
         self.debug("List of hostnames: " + str(hostnames_list))
+        # owner of the address from the exported netblocks, without a RIPE request
+        record = self.lpm.lookup(ip) if self.lpm is not None else None
+        country = None
+        if record is not None:
+            netblock, netname, country, admin = record
+            self.verbose("%s is in %s (%s, %s)" % (ip, netblock, netname, admin))
         for hostname in hostnames_list:
             self.verbose('Insert '+hostname + " for IP "+ip)
-            self.insert_hosts(host=hostname,ip_address=ip)
+            self.queue_row('hosts', dict(host=hostname,ip_address=ip,country=country))
 
 # Load JSON string and search it for attribute
     def json_search(self, json_string, searchAttr):
@@ -43,10 +65,14 @@ class Module(BaseModule, ResolverMixin, ThreadingMixin):
             return result
         try:
             data = json.loads(json_string)
+        except ValueError:
+            raise RequestFailed("Could not find a valid JSON in response!")
+        try:
             self.debug("Number of objects: " + str(len(data["pas"])))
             for element in data["pas"]:
                 self.debug("Object:" +str(element))
                 result.append(element[searchAttr])
-        except:
-            self.error("Could not find a valid JSON in response!")
+        except (KeyError, TypeError):
+            # no passive DNS entries for the address
+            pass
         return result
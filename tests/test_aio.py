@@ -0,0 +1,106 @@
+# Tests of the asyncio request engine against a local stub HTTP server.
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ripelib.aio import AsyncEngine, HttpPool
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path.startswith('/chunked'):
+            self.send_response(200)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for chunk in (b'{"a":', b' 1}'):
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.write(b'0\r\n\r\n')
+            return
+        if self.path.startswith('/missing'):
+            body, status = b'not found', 404
+        elif self.path.startswith('/slow'):
+            time.sleep(1.0)
+            body, status = b'late', 200
+        else:
+            body, status = ('ok %s' % self.path).encode(), 200
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class AsyncEngineTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        cls.server.daemon_threads = True
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base = 'http://127.0.0.1:%d' % cls.server.server_address[1]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_keep_alive_pool(self):
+        engine = AsyncEngine(connections=4, concurrency=16, timeout=5)
+        try:
+            results = []
+            threads = [threading.Thread(target=lambda i=i: results.append(engine.fetch('%s/item?n=%d' % (self.base, i))))
+                       for i in range(200)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(len(results), 200)
+            self.assertTrue(all(resp.status_code == 200 for resp in results))
+            self.assertEqual(engine.pool.requests, 200)
+            self.assertLessEqual(engine.pool.opened, 4)
+        finally:
+            engine.close()
+
+    def test_chunked_and_not_found(self):
+        engine = AsyncEngine(timeout=5)
+        try:
+            resp = engine.fetch(self.base + '/chunked')
+            self.assertEqual((resp.status_code, resp.text), (200, '{"a": 1}'))
+            resp = engine.fetch(self.base + '/missing')
+            self.assertEqual((resp.status_code, resp.text), (404, 'not found'))
+        finally:
+            engine.close()
+
+    def test_timeout_closes_connection(self):
+        writers = []
+        connect = HttpPool._connect
+
+        async def recording_connect(pool, key):
+            reader, writer = await connect(pool, key)
+            writers.append(writer)
+            return reader, writer
+
+        HttpPool._connect = recording_connect
+        engine = AsyncEngine(timeout=0.2)
+        try:
+            with self.assertRaises(Exception):
+                engine.fetch(self.base + '/slow')
+            self.assertEqual(len(writers), 1)
+            self.assertTrue(writers[0].is_closing())
+            self.assertEqual(sum(len(idle) for idle in engine.pool._idle.values()), 0)
+        finally:
+            HttpPool._connect = connect
+            engine.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# Tests of the interval index against a brute-force scan of the ranges.
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ripelib.intervals import IntervalIndex
+from ripelib.rpsl import RpslObject
+
+
+def nested_ranges(rng, start, end, depth):
+    """Random ranges inside start..end that nest but never overlap."""
+    ranges = []
+    position = start
+    while depth and position <= end and rng.random() < 0.8:
+        first = rng.randint(position, end)
+        last = rng.randint(first, min(end, first + rng.randint(0, end - start)))
+        if (first, last) != (start, end):
+            ranges.append((first, last))
+            ranges += nested_ranges(rng, first, last, depth - 1)
+        position = last + 1
+    return ranges
+
+
+def most_specific(ranges, address):
+    covering = [bounds for bounds in ranges if bounds[0] <= address <= bounds[1]]
+    return min(covering, key=lambda bounds: bounds[1] - bounds[0]) if covering else None
+
+
+class IntervalIndexTest(unittest.TestCase):
+
+    def test_random_nested_ranges(self):
+        rng = random.Random(2)
+        for _ in range(200):
+            ranges = nested_ranges(rng, 0, 1 << 16, 5)
+            rng.shuffle(ranges)
+            index = IntervalIndex()
+            for start, end in ranges:
+                index.add(4, start, end, (start, end))
+            for address in [rng.randint(0, 1 << 16) for _ in range(50)] + [bound for bounds in ranges[:20] for bound in bounds]:
+                self.assertEqual(index.find(4, address), most_specific(ranges, address))
+
+    def test_gap_between_children(self):
+        index = IntervalIndex()
+        index.add(4, 10 << 24, (11 << 24) - 1, 'slash8')
+        for i in range(0, 1000, 2):
+            start = (10 << 24) + i * 256
+            index.add(4, start, start + 255, 'slash24')
+        self.assertEqual(index.find(4, (10 << 24) + 256), 'slash8')
+        self.assertEqual(index.find(4, (10 << 24) + 5), 'slash24')
+        self.assertEqual(index.find(4, (10 << 24) + 3000 * 256), 'slash8')
+        self.assertIsNone(index.find(4, 9 << 24))
+        self.assertIsNone(index.find(6, 10 << 24))
+
+    def test_save_and_load(self):
+        index = IntervalIndex()
+        for key in ('10.0.0.0 - 10.255.255.255', '10.1.0.0 - 10.1.255.255', '2001:db8::/32'):
+            index.add_object(RpslObject('inetnum', [('inetnum', key), ('netname', 'N')]))
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'index.json')
+            index.save(path)
+            loaded = IntervalIndex()
+            loaded.load(path)
+        self.assertEqual(len(loaded), 3)
+        self.assertEqual(loaded.lookup('10.1.2.3').key, '10.1.0.0 - 10.1.255.255')
+        self.assertEqual(loaded.lookup('10.2.0.1').key, '10.0.0.0 - 10.255.255.255')
+        self.assertEqual(loaded.lookup('2001:db8::1').key, '2001:db8::/32')
+        self.assertIsNone(loaded.lookup('192.0.2.1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+# Tests of the memory-mapped netblock database against the netblock trie.
+import ipaddress
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ripelib.lpmdb import LpmDatabase, flatten_ranges, write_lpm
+from ripelib.trie import NetblockTrie
+
+
+def random_rows(rng, count):
+    """Rows of nested random IPv4 and IPv6 netblocks with their strings."""
+    rows = {}
+    for version, network_class in ((4, ipaddress.IPv4Network), (6, ipaddress.IPv6Network)):
+        bits = 32 if version == 4 else 128
+        roots = [rng.getrandbits(bits) for _ in range(3)]
+        target = len(rows) + count
+        while len(rows) < target:
+            address = rng.choice(roots) ^ rng.getrandbits(bits - rng.randint(4, bits))
+            network = network_class((address, rng.randint(4, bits)), strict=False)
+            rows[str(network)] = (str(network), rng.choice(('NET-%d', 'NETZ-MÜNCHEN-%d')) % rng.randrange(50),
+                                  rng.choice(('DE', 'NL', '')), 'AB%d-RIPE' % rng.randrange(50))
+    return sorted(rows.values())
+
+
+class LpmDatabaseTest(unittest.TestCase):
+
+    def test_matches_trie(self):
+        rng = random.Random(16)
+        rows = random_rows(rng, 2000)
+        trie = NetblockTrie()
+        for row in rows:
+            trie.add(row[0], row)
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'netblocks.lpm')
+            self.assertEqual(write_lpm(path, rows + [('not a netblock', 'X', 'X', 'X')]), len(rows))
+            database = LpmDatabase(path)
+            try:
+                addresses = []
+                for netblock in rng.sample([row[0] for row in rows], 500):
+                    network = ipaddress.ip_network(netblock)
+                    addresses += [network.network_address, network.broadcast_address,
+                                  network.network_address + rng.randrange(network.num_addresses)]
+                addresses += [ipaddress.IPv4Address(rng.getrandbits(32)) for _ in range(200)]
+                addresses += [ipaddress.IPv6Address(rng.getrandbits(128)) for _ in range(200)]
+                for address in addresses:
+                    self.assertEqual(database.lookup(str(address)), trie.lookup(str(address)))
+                self.assertIsNone(database.lookup('bogus'))
+            finally:
+                database.close()
+
+    def test_flatten_ranges(self):
+        ranges = [(0, 99, 'a'), (10, 19, 'b'), (20, 29, 'c'), (12, 12, 'd'), (200, 299, 'e')]
+        self.assertEqual(flatten_ranges(ranges), [
+            (0, 9, 'a'), (10, 11, 'b'), (12, 12, 'd'), (13, 19, 'b'), (20, 29, 'c'), (30, 99, 'a'), (200, 299, 'e')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+# Tests of the CIDR conversion against the ipaddress module.
+import ipaddress
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ripelib.net import inetnum_to_cidrs, inetnums_to_cidrs, parse_range, range_to_cidrs
+
+
+def summarized(version, start, end):
+    cls = ipaddress.IPv4Address if version == 4 else ipaddress.IPv6Address
+    return [str(network) for network in ipaddress.summarize_address_range(cls(start), cls(end))]
+
+
+class CidrTest(unittest.TestCase):
+
+    def test_random_ranges(self):
+        rng = random.Random(13)
+        for version, bits in ((4, 32), (6, 128)):
+            for _ in range(2000):
+                start = rng.getrandbits(bits)
+                # mostly short ranges, some of them spanning large blocks
+                end = min(start + rng.getrandbits(rng.choice((8, 16, bits))), (1 << bits) - 1)
+                self.assertEqual(range_to_cidrs(version, start, end), summarized(version, start, end))
+
+    def test_edges(self):
+        for version, bits in ((4, 32), (6, 128)):
+            top = (1 << bits) - 1
+            for start, end in ((0, top), (0, 0), (top, top), (1, top - 1), (top - 255, top)):
+                self.assertEqual(range_to_cidrs(version, start, end), summarized(version, start, end))
+
+    def test_inetnum_values(self):
+        self.assertEqual(inetnum_to_cidrs('10.0.0.0 - 10.0.2.255'), ['10.0.0.0/23', '10.0.2.0/24'])
+        self.assertEqual(inetnum_to_cidrs('192.0.2.0/24'), ['192.0.2.0/24'])
+        self.assertEqual(inetnum_to_cidrs('2001:db8::/32'), ['2001:db8::/32'])
+        self.assertEqual(inetnum_to_cidrs('2001:db8:: - 2001:db8::3'), ['2001:db8::/126'])
+        for text in ('', 'not a range', '10.0.0.9 - 10.0.0.1', '10.0.0.256 - 10.0.1.0'):
+            self.assertEqual(inetnum_to_cidrs(text), [])
+            self.assertIsNone(parse_range(text))
+
+    def test_batch_matches_single(self):
+        texts = ['10.0.0.0 - 10.0.2.255', 'garbage', '2001:db8::/48', '172.16.0.0 - 172.31.255.255']
+        self.assertEqual(inetnums_to_cidrs(texts), [inetnum_to_cidrs(text) for text in texts])
+
+
+if __name__ == '__main__':
+    unittest.main()
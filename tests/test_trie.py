@@ -0,0 +1,62 @@
+# Tests of the netblock trie against a brute-force longest-prefix match.
+import ipaddress
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ripelib.trie import NetblockTrie
+
+
+def random_prefixes(rng, version, count):
+    """Random CIDRs below a few common roots, so that many of them nest."""
+    bits = 32 if version == 4 else 128
+    network_class = ipaddress.IPv4Network if version == 4 else ipaddress.IPv6Network
+    roots = [rng.getrandbits(bits) for _ in range(4)]
+    networks = set()
+    while len(networks) < count:
+        length = rng.randint(4, bits)
+        address = rng.choice(roots) ^ rng.getrandbits(bits - rng.randint(4, bits))
+        networks.add(network_class((address, length), strict=False))
+    return list(networks)
+
+
+def longest_match(networks, address):
+    matches = [network for network in networks if address in network]
+    return str(max(matches, key=lambda network: network.prefixlen)) if matches else None
+
+
+class NetblockTrieTest(unittest.TestCase):
+
+    def test_random_prefixes(self):
+        rng = random.Random(15)
+        for version in (4, 6):
+            networks = random_prefixes(rng, version, 2000)
+            trie = NetblockTrie()
+            for network in networks:
+                self.assertTrue(trie.add(str(network)))
+            self.assertEqual(len(trie), len(networks))
+            bits = 32 if version == 4 else 128
+            address_class = ipaddress.IPv4Address if version == 4 else ipaddress.IPv6Address
+            addresses = [network.network_address + rng.randrange(network.num_addresses) for network in rng.sample(networks, 300)]
+            addresses += [address_class(rng.getrandbits(bits)) for _ in range(100)]
+            for address in addresses:
+                self.assertEqual(trie.lookup(str(address)), longest_match(networks, address))
+
+    def test_values_and_invalid_input(self):
+        trie = NetblockTrie()
+        self.assertTrue(trie.add('10.0.0.0/8', 'big'))
+        self.assertTrue(trie.add('10.1.0.0/16'))
+        self.assertTrue(trie.add('0.0.0.0/0', 'default'))
+        self.assertFalse(trie.add('10.0.0.0 - 10.0.0.255'))
+        self.assertFalse(trie.add('not a netblock'))
+        self.assertEqual(trie.lookup('10.1.2.3'), '10.1.0.0/16')
+        self.assertEqual(trie.lookup('10.2.0.1'), 'big')
+        self.assertEqual(trie.lookup('192.0.2.1'), 'default')
+        self.assertIsNone(trie.lookup('2001:db8::1'))
+        self.assertIsNone(trie.lookup('bogus'))
+
+
+if __name__ == '__main__':
+    unittest.main()